@@ -0,0 +1,230 @@
+"""
+Graph-wide degrees-of-separation statistics.
+
+Runs a breadth-first search from every person (or from a random sample
+of people) over a pool of worker processes and reports the distribution
+of separation degrees, the most central people, and the diameter of each
+connected component. Finished chunks of sources are appended to a
+checkpoint file, so an interrupted run picks up where it stopped.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+from collections import Counter
+
+import degrees
+from graph import Graph
+
+# The graph analysed by the workers, set in the parent before forking
+graph = None
+
+
+def levels(s):
+    """
+    Breadth-first search from person index `s` over the whole component.
+    Returns a list whose i-th entry is the number of people exactly i
+    degrees away from `s`.
+    """
+    person_offsets, person_movies = graph.person_offsets, graph.person_movies
+    movie_offsets, movie_people = graph.movie_offsets, graph.movie_people
+    seen = bytearray(len(graph.person_ids))
+    scanned = bytearray(len(graph.movie_ids))
+
+    seen[s] = 1
+    layer = [s]
+    counts = [1]
+    while True:
+        next_layer = []
+        for p in layer:
+            for k in range(person_offsets[p], person_offsets[p + 1]):
+                m = person_movies[k]
+                if scanned[m]:
+                    continue
+                scanned[m] = 1
+                for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                    q = movie_people[j]
+                    if not seen[q]:
+                        seen[q] = 1
+                        next_layer.append(q)
+        if not next_layer:
+            return counts
+        counts.append(len(next_layer))
+        layer = next_layer
+
+
+def analyse_chunk(chunk):
+    """
+    Runs `levels` from every source in the chunk.
+
+    Returns a JSON-ready dict with the chunk id, the combined histogram
+    of degrees (distance 0 excluded) and, per source, its eccentricity,
+    the sum of its distances and the size of its component.
+    """
+    chunk_id, sources = chunk
+    histogram = Counter()
+    results = []
+    for s in sources:
+        counts = levels(s)
+        for distance in range(1, len(counts)):
+            histogram[distance] += counts[distance]
+        total = sum(distance * count for distance, count in enumerate(counts))
+        results.append([s, len(counts) - 1, total, sum(counts)])
+    return {"chunk": chunk_id, "histogram": histogram, "sources": results}
+
+
+def read_checkpoint(path, params):
+    """
+    Returns the finished chunks stored at `path`, or an empty dict if the
+    file does not exist or was written for different parameters.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        header = f.readline()
+        if not header or json.loads(header) != params:
+            return done
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # a partly written last line from an interrupted run
+                break
+            done[result["chunk"]] = result
+    return done
+
+
+def run(sources, workers, chunk_size, checkpoint, params):
+    """
+    Analyses all `sources`, resuming from and appending to `checkpoint`.
+    Returns the list of per-chunk results.
+    """
+    chunks = [
+        (i, sources[start:start + chunk_size])
+        for i, start in enumerate(range(0, len(sources), chunk_size))
+    ]
+    done = read_checkpoint(checkpoint, params) if checkpoint else {}
+    todo = [chunk for chunk in chunks if chunk[0] not in done]
+    if done:
+        print(f"Resuming: {len(done)} of {len(chunks)} chunks already done.", file=sys.stderr)
+
+    out = None
+    if checkpoint:
+        # rewrite what is kept, dropping a partly written last line
+        with open(checkpoint, "w", encoding="utf-8") as f:
+            f.write(json.dumps(params) + "\n")
+            for result in done.values():
+                f.write(json.dumps(result) + "\n")
+        out = open(checkpoint, "a", encoding="utf-8")
+
+    results = list(done.values())
+    pool = None
+    try:
+        if workers <= 1:
+            finished = map(analyse_chunk, todo)
+        else:
+            pool = multiprocessing.get_context("fork").Pool(workers)
+            finished = pool.imap_unordered(analyse_chunk, todo)
+        for result in finished:
+            results.append(result)
+            if out is not None:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+            print(f"{len(results)}/{len(chunks)} chunks", file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if out is not None:
+            out.close()
+    return results
+
+
+def summarize(results, sampled, top):
+    """
+    Combines chunk results into the histogram, the `top` most central
+    people and the diameter of each component that was searched.
+    """
+    index = degrees.component_index
+
+    histogram = Counter()
+    diameters = {}
+    centrality = []
+    for result in results:
+        for distance, count in result["histogram"].items():
+            histogram[int(distance)] += count
+        for s, eccentricity, total, reached in result["sources"]:
+            label = index.component(graph.person_ids[s])
+            diameters[label] = max(diameters.get(label, 0), eccentricity)
+            if reached > 1:
+                # closeness centrality within the component
+                centrality.append(((reached - 1) / total, s))
+
+    centrality.sort(reverse=True)
+    pairs = sum(histogram.values())
+    return {
+        # with sampling, diameters are lower bounds and the distribution
+        # is an estimate from the sampled sources
+        "sampled": sampled,
+        "histogram": dict(sorted(histogram.items())),
+        "distribution": {
+            distance: round(count / pairs, 6)
+            for distance, count in sorted(histogram.items())
+        },
+        "central": [
+            {"person_id": graph.person_ids[s],
+             "name": degrees.people[graph.person_ids[s]]["name"],
+             "closeness": round(closeness, 6)}
+            for closeness, s in centrality[:top]
+        ],
+        "components": [
+            {"component": label, "size": index.sizes[label], "diameter": diameter}
+            for label, diameter in sorted(diameters.items(), key=lambda item: item[0])
+        ],
+    }
+
+
+def main():
+    global graph
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--sample", type=int, default=None,
+                        help="search from this many random people instead of everyone")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--checkpoint", default=None,
+                        help="file to stream finished chunks to and resume from")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--compact", action="store_true")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, compact=args.compact)
+    print("Data loaded.", file=sys.stderr)
+
+    # reuse the loaded data; the CSR form is built only if needed
+    graph = degrees.graph or Graph.from_dicts(degrees.people, degrees.movies)
+
+    sources = list(range(len(graph.person_ids)))
+    if args.sample is not None and args.sample < len(sources):
+        sources = sorted(random.Random(args.seed).sample(sources, args.sample))
+
+    params = {
+        "directory": os.path.abspath(args.directory),
+        "people": len(graph.person_ids),
+        "sample": args.sample,
+        "seed": args.seed,
+        "chunk_size": args.chunk_size,
+    }
+    results = run(sources, args.workers, args.chunk_size, args.checkpoint, params)
+    summary = summarize(results, args.sample is not None, args.top)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
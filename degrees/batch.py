@@ -0,0 +1,122 @@
+"""
+Answer many degrees-of-separation queries with one loaded graph.
+
+Reads JSON lines such as {"source": "Kevin Bacon", "target": "Tom Hanks"}
+from a file or stdin and writes one JSON line per query. Names or
+person_ids are accepted. Queries are spread over a pool of forked
+worker processes that share the loaded data copy-on-write.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+
+import degrees
+from cache import PathCache
+
+# Set in the parent before the pool is forked
+bidirectional = False
+cache = None
+
+
+def resolve(person):
+    """
+    Returns the person_id for a person_id or an unambiguous name.
+    Raises ValueError otherwise.
+    """
+    if person in degrees.people:
+        return person
+    person_ids = degrees.names.get(person.lower(), set())
+    if len(person_ids) == 1:
+        return next(iter(person_ids))
+    if not person_ids:
+        suggestions = degrees.name_index.search(person, limit=5) if degrees.name_index else []
+        if suggestions:
+            raise ValueError(f"person not found: {person} (did you mean: {', '.join(suggestions)})")
+        raise ValueError(f"person not found: {person}")
+    raise ValueError(f"ambiguous name: {person} ({', '.join(sorted(person_ids))})")
+
+
+def answer(line):
+    """
+    Answers one JSON query line and returns the JSON result line.
+    """
+    try:
+        query = json.loads(line)
+        source = resolve(str(query["source"]))
+        target = resolve(str(query["target"]))
+    except (ValueError, KeyError, TypeError) as e:
+        return json.dumps({"query": line.strip(), "error": str(e)})
+
+    if cache is not None:
+        path = cache.shortest_path(source, target)
+    else:
+        path = degrees.shortest_path(source, target, bidirectional=bidirectional)
+    result = {"source": source, "target": target}
+    if path is None:
+        result["degrees"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = path
+    return json.dumps(result)
+
+
+def run(lines, workers=1, output=sys.stdout):
+    """
+    Answers every query in `lines` and writes the results to `output`
+    in input order. Returns the number of queries answered.
+    """
+    lines = (line for line in lines if line.strip())
+    count = 0
+    if workers <= 1:
+        for result in map(answer, lines):
+            print(result, file=output)
+            count += 1
+        return count
+
+    # fork so the workers share the already loaded graph
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        for result in pool.imap(answer, lines, chunksize=16):
+            print(result, file=output)
+            count += 1
+    return count
+
+
+def main():
+    global bidirectional, cache
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("queries", nargs="?", default="-",
+                        help="file with one JSON query per line (default: stdin)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--bidirectional", action="store_true")
+    parser.add_argument("--cache-mb", type=int, default=0,
+                        help="keep BFS trees per source in an LRU cache of this size")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_false")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, compact=args.compact, use_snapshot=args.snapshot)
+    print("Data loaded.", file=sys.stderr)
+    print(f"Components: {degrees.component_index.summary()}", file=sys.stderr)
+
+    bidirectional = args.bidirectional
+    if args.cache_mb:
+        cache = PathCache(args.cache_mb * 2**20)
+    if args.queries == "-":
+        run(sys.stdin, args.workers)
+    else:
+        with open(args.queries, encoding="utf-8") as f:
+            run(f, args.workers)
+
+    # with a pool every worker has its own cache
+    if cache is not None and args.workers <= 1:
+        print(f"Cache: {cache.stats()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+"""
+Benchmarks for the degrees project.
+
+Usage: python benchmark.py <benchmark> [options]
+Run `python benchmark.py -h` for the list of benchmarks.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import batch
+import weighted
+import degrees
+import snapshot
+from cache import BUILD_AFTER, PathCache
+from nameindex import NameIndex
+from util import Node, StackFrontier, QueueFrontier
+
+
+class ListStackFrontier():
+    """
+    The original list based frontier, kept as a baseline.
+    """
+    def __init__(self):
+        self.frontier = []
+
+    def add(self, node):
+        self.frontier.append(node)
+
+    def contains_state(self, state):
+        return any(node.state == state for node in self.frontier)
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[-1]
+            self.frontier = self.frontier[:-1]
+            return node
+
+
+class ListQueueFrontier(ListStackFrontier):
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[0]
+            self.frontier = self.frontier[1:]
+            return node
+
+
+def synthetic_graph(num_people, num_movies, cast_size, seed=0):
+    """
+    Fill the `names`, `people` and `movies` dictionaries of the degrees
+    module with a random co-star graph.
+
+    Every movie gets `cast_size` stars. Stars are drawn with a skewed
+    distribution so a few people appear in many movies, like in the
+    IMDb data. Returns the number of co-star edges.
+    """
+    rng = random.Random(seed)
+    reset()
+
+    for i in range(num_people):
+        person_id = str(i)
+        name = f"person {i}"
+        degrees.people[person_id] = {
+            "name": name,
+            "birth": str(1900 + i % 100),
+            "movies": set()
+        }
+        degrees.names.setdefault(name, set()).add(person_id)
+
+    for j in range(num_movies):
+        movie_id = f"m{j}"
+        degrees.movies[movie_id] = {
+            "title": f"movie {j}",
+            "year": str(1920 + j % 100),
+            "stars": set()
+        }
+        for _ in range(cast_size):
+            person_id = str(int(num_people * rng.random() ** 2))
+            degrees.movies[movie_id]["stars"].add(person_id)
+            degrees.people[person_id]["movies"].add(movie_id)
+
+    return sum(
+        len(movie["stars"]) * (len(movie["stars"]) - 1)
+        for movie in degrees.movies.values()
+    )
+
+
+def reset():
+    """
+    Empties the data loaded into the degrees module.
+    """
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.graph = None
+    degrees.component_index = None
+    degrees.name_index = None
+
+
+def write_synthetic_csv(directory, num_people, num_movies, cast_size, seed=0):
+    """
+    Writes a synthetic dataset in the people.csv / movies.csv / stars.csv
+    layout into `directory`.
+    """
+    synthetic_graph(num_people, num_movies, cast_size, seed)
+    with open(os.path.join(directory, "people.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person_id, person in degrees.people.items():
+            writer.writerow([person_id, person["name"], person["birth"]])
+    with open(os.path.join(directory, "movies.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for movie_id, movie in degrees.movies.items():
+            writer.writerow([movie_id, movie["title"], movie["year"]])
+    with open(os.path.join(directory, "stars.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie_id, movie in degrees.movies.items():
+            for person_id in sorted(movie["stars"]):
+                writer.writerow([person_id, movie_id])
+    reset()
+
+
+def bfs(source, frontier_class, limit=None):
+    """
+    Breadth-first expansion from `source` using the same loop as
+    `degrees.shortest_path`, stopping after `limit` expanded nodes.
+    Returns the number of expanded nodes.
+    """
+    frontier = frontier_class()
+    frontier.add(Node(state=source, parent=None, action=None))
+    explored = set()
+
+    while not frontier.empty():
+        if limit is not None and len(explored) >= limit:
+            break
+        node = frontier.remove()
+        explored.add(node.state)
+        for action, state in degrees.neighbors_for_person(node.state):
+            if not frontier.contains_state(state) and state not in explored:
+                frontier.add(Node(state=state, parent=node, action=action))
+
+    return len(explored)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_frontier(args):
+    edges = synthetic_graph(args.people, args.movies, args.cast, args.seed)
+    print(f"Graph: {args.people} people, {args.movies} movies, {edges} co-star edges")
+
+    source = min(degrees.movies["m0"]["stars"])
+    for label, frontier_class in [
+        ("list queue (old)", ListQueueFrontier),
+        ("deque queue (new)", QueueFrontier),
+        ("list stack (old)", ListStackFrontier),
+        ("deque stack (new)", StackFrontier),
+    ]:
+        expanded, seconds = timed(bfs, source, frontier_class, args.limit)
+        print(f"  {label:20} expanded {expanded:8} nodes in {seconds:8.3f}s "
+              f"({expanded / seconds:10.0f} nodes/s)")
+
+
+def random_pairs(count, seed=0):
+    """
+    Returns `count` random (source, target) pairs of people who
+    appear in at least one movie.
+    """
+    rng = random.Random(seed)
+    cast = sorted(p for p in degrees.people if degrees.people[p]["movies"])
+    return [(rng.choice(cast), rng.choice(cast)) for _ in range(count)]
+
+
+def bench_bidirectional(args):
+    edges = synthetic_graph(args.people, args.movies, args.cast, args.seed)
+    print(f"Graph: {args.people} people, {args.movies} movies, {edges} co-star edges")
+    pairs = random_pairs(args.queries, args.seed)
+
+    results = {}
+    for label, bidirectional in [("bfs", False), ("bidirectional", True)]:
+        expanded = 0
+        lengths = []
+        start = time.perf_counter()
+        for source, target in pairs:
+            stats = {}
+            path = degrees.shortest_path(source, target, bidirectional, stats)
+            expanded += stats["expanded"]
+            lengths.append(None if path is None else len(path))
+        seconds = time.perf_counter() - start
+        results[label] = lengths
+        print(f"  {label:14} {expanded / len(pairs):12.0f} nodes expanded/query "
+              f"{seconds / len(pairs) * 1000:10.2f} ms/query")
+
+    if results["bfs"] != results["bidirectional"]:
+        print("  WARNING: path lengths differ between modes")
+
+
+def bench_weighted(args):
+    edges = synthetic_graph(args.people, args.movies, args.cast, args.seed)
+    print(f"Graph: {args.people} people, {args.movies} movies, {edges} co-star edges")
+    graph = degrees.Graph.from_dicts(degrees.people, degrees.movies)
+    pairs = random_pairs(args.queries, args.seed)
+    rng = random.Random(args.seed)
+    excluded = set(rng.sample(sorted(degrees.movies), args.exclude))
+
+    by_year = weighted.by_year(degrees.movies)
+    table, seconds = timed(weighted.cost_table, graph, by_year)
+    print(f"  by_year cost table built in {seconds * 1000:.2f} ms")
+
+    def dijkstra(source, target, stats):
+        s, t = graph.person_index[source], graph.person_index[target]
+        stats["expanded"] = weighted.search(graph, s, t, table)[2]
+
+    for label, kwargs in [
+        ("BFS (Graph.shortest_path)", None),
+        ("cheapest_path, no costs", {}),
+        (f"  + {args.exclude} excluded movies", {"exclude_movies": excluded}),
+        ("cheapest_path, uniform costs", {"cost": weighted.uniform}),
+        ("cheapest_path, constant costs", {"cost": lambda movie_id: 1}),
+        ("Dijkstra, by_year costs", dijkstra),
+        ("A*, by_year costs", {"cost": by_year}),
+        ("  with a cost table", {"cost": table}),
+    ]:
+        expanded = 0
+        start = time.perf_counter()
+        for source, target in pairs:
+            stats = {}
+            if kwargs is None:
+                graph.shortest_path(source, target, stats)
+            elif callable(kwargs):
+                kwargs(source, target, stats)
+            else:
+                weighted.cheapest_path(graph, source, target, stats=stats, **kwargs)
+            expanded += stats["expanded"]
+        seconds = time.perf_counter() - start
+        print(f"  {label:32} {seconds / len(pairs) * 1000:8.2f} ms/query "
+              f"{expanded / len(pairs):10.0f} expanded/query")
+
+
+def bench_load(args):
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_csv(directory, args.people, args.movies, args.cast, args.seed)
+        # synthetic movie years run from 1920 to 2019
+        filters = [
+            ("full", {}),
+            (f"movies >= {args.min_year}", {"min_year": args.min_year}),
+            (f"{args.subset} people", {"person_ids": {str(i) for i in range(args.subset)}}),
+        ]
+        for compact in (False, True):
+            for label, kwargs in filters:
+                reset()
+                _, seconds = timed(degrees.load_data, directory, compact, False, **kwargs)
+                reset()
+                tracemalloc.start()
+                degrees.load_data(directory, compact, False, **kwargs)
+                size, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                stats = degrees.load_stats
+                print(f"  {'CSR' if compact else 'dict':4} {label:18} {seconds:6.2f}s  "
+                      f"memory {size / 2**20:7.1f} MiB  peak {peak / 2**20:7.1f} MiB  "
+                      f"{stats['people']} people, {stats['stars']} stars kept, "
+                      f"{stats['stars filtered']} filtered, {stats['stars dangling']} dangling")
+
+
+def bench_csr(args):
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_csv(directory, args.people, args.movies, args.cast, args.seed)
+
+        pairs = None
+        for label, compact in [("dict of sets", False), ("CSR arrays", True)]:
+            reset()
+            tracemalloc.start()
+            degrees.load_data(directory, compact=compact)
+            size, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            if pairs is None:
+                pairs = random_pairs(args.queries, args.seed)
+            expanded = 0
+            start = time.perf_counter()
+            for source, target in pairs:
+                stats = {}
+                degrees.shortest_path(source, target, stats=stats)
+                expanded += stats["expanded"]
+            seconds = time.perf_counter() - start
+
+            print(f"  {label:13} memory {size / 2**20:8.1f} MiB (peak {peak / 2**20:8.1f} MiB)  "
+                  f"BFS {len(pairs) / seconds:8.2f} queries/s, {expanded / seconds:10.0f} nodes/s")
+
+
+def bench_snapshot(args):
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_csv(directory, args.people, args.movies, args.cast, args.seed)
+        path = snapshot.snapshot_path(directory)
+
+        for label, compact in [("dict of sets", False), ("CSR arrays", True)]:
+            if os.path.exists(path):
+                os.remove(path)
+            reset()
+            _, cold = timed(degrees.load_data, directory, compact, False)
+            reset()
+            _, write = timed(degrees.load_data, directory, compact, True)
+            reset()
+            _, warm = timed(degrees.load_data, directory, compact, True)
+            print(f"  {label:13} cold parse {cold:7.2f}s  parse + write snapshot {write:7.2f}s  "
+                  f"warm snapshot load {warm:7.2f}s  ({cold / warm:5.1f}x)")
+        print(f"  snapshot size {os.path.getsize(path) / 2**20:.1f} MiB")
+
+
+def bench_batch(args):
+    edges = synthetic_graph(args.people, args.movies, args.cast, args.seed)
+    print(f"Graph: {args.people} people, {args.movies} movies, {edges} co-star edges")
+    lines = [json.dumps({"source": source, "target": target})
+             for source, target in random_pairs(args.queries, args.seed)]
+    batch.bidirectional = args.bidirectional
+
+    workers = 1
+    while workers <= args.max_workers:
+        count, seconds = timed(batch.run, lines, workers, io.StringIO())
+        print(f"  {workers:3} workers {count / seconds:10.1f} queries/s")
+        workers *= 2
+
+
+def zipf_pairs(count, exponent=1.1, seed=0):
+    """
+    Returns `count` (source, target) pairs whose sources follow a Zipf
+    distribution over the cast, so a few people are asked about a lot.
+    Targets are uniform.
+    """
+    rng = random.Random(seed)
+    cast = sorted(p for p in degrees.people if degrees.people[p]["movies"])
+    rng.shuffle(cast)
+    weights = [1 / (rank + 1) ** exponent for rank in range(len(cast))]
+    sources = rng.choices(cast, weights, k=count)
+    return [(source, rng.choice(cast)) for source in sources]
+
+
+def bench_cache(args):
+    edges = synthetic_graph(args.people, args.movies, args.cast, args.seed)
+    print(f"Graph: {args.people} people, {args.movies} movies, {edges} co-star edges")
+    pairs = zipf_pairs(args.queries, args.exponent, args.seed)
+
+    for compact in (False, True):
+        degrees.graph = degrees.Graph.from_dicts(degrees.people, degrees.movies) if compact else None
+        label = "CSR" if compact else "dict"
+
+        for name, bidirectional in [("BFS", False), ("bidirectional", True)]:
+            _, seconds = timed(lambda: [degrees.shortest_path(s, t, bidirectional)
+                                        for s, t in pairs])
+            print(f"  {label:5} {name + ', no cache':23} {len(pairs) / seconds:10.1f} queries/s")
+
+        for name, build_after in [("tree cache, every source", 1),
+                                  (f"tree cache, after {args.build_after}", args.build_after)]:
+            cache = PathCache(args.cache_mb * 2**20, build_after)
+            _, seconds = timed(lambda: [cache.shortest_path(s, t) for s, t in pairs])
+            stats = cache.stats()
+            print(f"  {label:5} {name:23} {len(pairs) / seconds:10.1f} queries/s  "
+                  f"hits {stats['hits']} misses {stats['misses']} builds {stats['builds']} "
+                  f"evictions {stats['evictions']} ({stats['bytes'] / 2**20:.1f} MiB)")
+    degrees.graph = None
+
+
+def random_name(rng):
+    syllables = ["an", "bel", "car", "da", "el", "fi", "gor", "ha", "is", "jo",
+                 "ka", "li", "mo", "na", "or", "pe", "ri", "sa", "to", "vy"]
+    first = "".join(rng.choice(syllables) for _ in range(rng.randint(1, 3)))
+    last = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+    return f"{first} {last}"
+
+
+def typo(name, rng):
+    i = rng.randrange(len(name))
+    edit = rng.choice(["delete", "insert", "replace"])
+    if edit == "delete":
+        return name[:i] + name[i + 1:]
+    letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    if edit == "insert":
+        return name[:i] + letter + name[i:]
+    return name[:i] + letter + name[i + 1:]
+
+
+def bench_names(args):
+    rng = random.Random(args.seed)
+    keys = {random_name(rng) for _ in range(args.names)}
+    scan, seconds = timed(NameIndex.from_names, keys, None)
+    print(f"Index of {len(scan)} names built in {seconds:.2f}s")
+    index = NameIndex(scan.keys, index_after=0)
+    for edits in (1, 2):
+        _, seconds = timed(index.build_segments, edits)
+        print(f"  segment index for {edits} edit(s) built in {seconds:.2f}s")
+
+    targets = rng.sample(index.keys, args.queries)
+    queries = [typo(name, rng) for name in targets]
+
+    for label, search in [
+        ("exact", lambda q: q in keys),
+        ("prefix", lambda q: index.prefix(q[:5])),
+        ("fuzzy (1 edit)", lambda q: scan.fuzzy(q, 1)),
+        ("  segment index", lambda q: index.fuzzy(q, 1)),
+        ("fuzzy (2 edits)", lambda q: scan.fuzzy(q, 2)),
+        ("  segment index", lambda q: index.fuzzy(q, 2)),
+        ("ranked search", lambda q: index.search(q)),
+    ]:
+        results, seconds = timed(lambda: [search(q) for q in queries])
+        print(f"  {label:16} {seconds / len(queries) * 1000:8.2f} ms/query")
+
+    found = sum(
+        any(name == target for _, name in index.fuzzy(query, 1, limit=len(index)))
+        for query, target in zip(queries, targets)
+    )
+    print(f"  intended name among 1-edit candidates for {found}/{len(queries)} typos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    frontier = subparsers.add_parser(
+        "frontier", help="list vs deque frontiers on a synthetic co-star graph")
+    frontier.add_argument("--people", type=int, default=200000)
+    frontier.add_argument("--movies", type=int, default=60000)
+    frontier.add_argument("--cast", type=int, default=8)
+    frontier.add_argument("--limit", type=int, default=500,
+                          help="stop each search after this many expanded nodes")
+    frontier.add_argument("--seed", type=int, default=0)
+    frontier.set_defaults(run=bench_frontier)
+
+    bidirectional = subparsers.add_parser(
+        "bidirectional", help="single-ended vs bidirectional shortest_path")
+    bidirectional.add_argument("--people", type=int, default=200000)
+    bidirectional.add_argument("--movies", type=int, default=60000)
+    bidirectional.add_argument("--cast", type=int, default=8)
+    bidirectional.add_argument("--queries", type=int, default=20)
+    bidirectional.add_argument("--seed", type=int, default=0)
+    bidirectional.set_defaults(run=bench_bidirectional)
+
+    csr = subparsers.add_parser(
+        "csr", help="memory and BFS throughput of dict vs CSR graph storage")
+    csr.add_argument("--people", type=int, default=200000)
+    csr.add_argument("--movies", type=int, default=60000)
+    csr.add_argument("--cast", type=int, default=8)
+    csr.add_argument("--queries", type=int, default=20)
+    csr.add_argument("--seed", type=int, default=0)
+    csr.set_defaults(run=bench_csr)
+
+    snapshot_parser = subparsers.add_parser(
+        "snapshot", help="startup time of a cold CSV parse vs a warm snapshot load")
+    snapshot_parser.add_argument("--people", type=int, default=200000)
+    snapshot_parser.add_argument("--movies", type=int, default=60000)
+    snapshot_parser.add_argument("--cast", type=int, default=8)
+    snapshot_parser.add_argument("--seed", type=int, default=0)
+    snapshot_parser.set_defaults(run=bench_snapshot)
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="batch query throughput as the worker count grows")
+    batch_parser.add_argument("--people", type=int, default=200000)
+    batch_parser.add_argument("--movies", type=int, default=60000)
+    batch_parser.add_argument("--cast", type=int, default=8)
+    batch_parser.add_argument("--queries", type=int, default=2000)
+    batch_parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    batch_parser.add_argument("--bidirectional", action="store_true")
+    batch_parser.add_argument("--seed", type=int, default=0)
+    batch_parser.set_defaults(run=bench_batch)
+
+    cache_parser = subparsers.add_parser(
+        "cache", help="BFS tree cache on a Zipf-skewed query workload")
+    cache_parser.add_argument("--people", type=int, default=200000)
+    cache_parser.add_argument("--movies", type=int, default=60000)
+    cache_parser.add_argument("--cast", type=int, default=8)
+    cache_parser.add_argument("--queries", type=int, default=2000)
+    cache_parser.add_argument("--exponent", type=float, default=1.1)
+    cache_parser.add_argument("--cache-mb", type=int, default=64)
+    cache_parser.add_argument("--build-after", type=int, default=BUILD_AFTER,
+                              help="queries per person before its tree is cached")
+    cache_parser.add_argument("--seed", type=int, default=0)
+    cache_parser.set_defaults(run=bench_cache)
+
+    load = subparsers.add_parser(
+        "load", help="time and memory of a full vs filtered streaming load")
+    load.add_argument("--people", type=int, default=200000)
+    load.add_argument("--movies", type=int, default=60000)
+    load.add_argument("--cast", type=int, default=8)
+    load.add_argument("--min-year", type=int, default=2000)
+    load.add_argument("--subset", type=int, default=10000,
+                      help="size of the person subset to load")
+    load.add_argument("--seed", type=int, default=0)
+    load.set_defaults(run=bench_load)
+
+    weighted_parser = subparsers.add_parser(
+        "weighted", help="Dijkstra with cost functions and exclusions vs BFS")
+    weighted_parser.add_argument("--people", type=int, default=200000)
+    weighted_parser.add_argument("--movies", type=int, default=60000)
+    weighted_parser.add_argument("--cast", type=int, default=8)
+    weighted_parser.add_argument("--queries", type=int, default=20)
+    weighted_parser.add_argument("--exclude", type=int, default=100)
+    weighted_parser.add_argument("--seed", type=int, default=0)
+    weighted_parser.set_defaults(run=bench_weighted)
+
+    names_parser = subparsers.add_parser(
+        "names", help="prefix and fuzzy name lookup latency")
+    names_parser.add_argument("--names", type=int, default=1000000)
+    names_parser.add_argument("--queries", type=int, default=100)
+    names_parser.add_argument("--seed", type=int, default=0)
+    names_parser.set_defaults(run=bench_names)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import sys
+from collections import Counter, OrderedDict, deque
+
+import degrees
+
+# Queries from or to a person that are searched one by one before the
+# whole BFS tree of that person is built and cached
+BUILD_AFTER = 20
+
+
+class PathCache():
+    """
+    LRU cache of finished breadth-first search trees, keyed by source
+    person_id.
+
+    A tree covers the whole component of its person, so it costs about
+    as much as many bidirectional searches. Queries are therefore
+    answered by `degrees.shortest_path` until one of their two people
+    has been asked about `build_after` times; only then is that
+    person's tree built and kept. Every later query from (or to) that
+    person is answered by walking the tree. Trees are evicted least
+    recently used first once their estimated size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, build_after=BUILD_AFTER):
+        self.max_bytes = max_bytes
+        self.build_after = build_after
+        self.trees = OrderedDict()
+        # queries per person that has no tree
+        self.seen = Counter()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "builds": self.builds,
+            "evictions": self.evictions,
+            "trees": len(self.trees),
+            "bytes": self.bytes,
+        }
+
+    def shortest_path(self, source, target):
+        """
+        Same result as degrees.shortest_path(source, target).
+        """
+        index = degrees.component_index
+        if index is not None and not index.connected(source, target):
+            return None
+
+        if source in self.trees:
+            self.hits += 1
+            self.trees.move_to_end(source)
+            return self.trees[source][0].path_to(target)
+
+        # paths are symmetric, so a tree from the target works too
+        if target in self.trees:
+            self.hits += 1
+            self.trees.move_to_end(target)
+            return self.trees[target][0].path_from(source)
+
+        self.misses += 1
+        self.seen[source] += 1
+        self.seen[target] += 1
+        if self.seen[source] >= self.build_after:
+            return self.add(source).path_to(target)
+        if self.seen[target] >= self.build_after:
+            return self.add(target).path_from(source)
+        return degrees.shortest_path(source, target, bidirectional=True)
+
+    def add(self, person_id):
+        """
+        Builds and caches the tree of `person_id`, evicting the least
+        recently used trees while the cache is over `max_bytes`.
+        """
+        del self.seen[person_id]
+        tree = build_tree(person_id)
+        size = tree.nbytes()
+        self.trees[person_id] = (tree, size)
+        self.bytes += size
+        self.builds += 1
+        while self.bytes > self.max_bytes and len(self.trees) > 1:
+            _, (_, evicted) = self.trees.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+        return tree
+
+
+class ArrayTree():
+    """
+    BFS tree over the CSR graph: parent and via are int32 arrays indexed
+    by person index.
+    """
+
+    def __init__(self, graph, source):
+        self.graph = graph
+        self.source = graph.person_index[source]
+        self.parent, self.via, _ = graph.bfs(self.source)
+
+    def nbytes(self):
+        return (len(self.parent) * self.parent.itemsize
+                + len(self.via) * self.via.itemsize)
+
+    def path_to(self, target):
+        t = self.graph.person_index[target]
+        if self.parent[t] == -1:
+            return None
+        return self.graph.path(self.parent, self.via, self.source, t)
+
+    def path_from(self, person_id):
+        p = self.graph.person_index[person_id]
+        if self.parent[p] == -1:
+            return None
+        path = []
+        while p != self.source:
+            path.append((self.graph.movie_ids[self.via[p]],
+                         self.graph.person_ids[self.parent[p]]))
+            p = self.parent[p]
+        return path
+
+
+class DictTree():
+    """
+    BFS tree over the `people`/`movies` dictionaries: maps each reached
+    person_id to (movie_id, parent person_id).
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.parents = {source: None}
+        # each movie's cast only has to be scanned once
+        scanned = set()
+        queue = deque([source])
+        while queue:
+            person_id = queue.popleft()
+            for movie_id in degrees.people[person_id]["movies"]:
+                if movie_id in scanned:
+                    continue
+                scanned.add(movie_id)
+                for neighbor in degrees.movies[movie_id]["stars"]:
+                    if neighbor not in self.parents:
+                        self.parents[neighbor] = (movie_id, person_id)
+                        queue.append(neighbor)
+
+    def nbytes(self):
+        # the dict itself plus one (movie_id, person_id) tuple per entry;
+        # the id strings are shared with `people` and `movies`
+        return sys.getsizeof(self.parents) + len(self.parents) * sys.getsizeof((None, None))
+
+    def path_to(self, target):
+        if target not in self.parents:
+            return None
+        path = []
+        while self.parents[target] is not None:
+            movie_id, parent = self.parents[target]
+            path.append((movie_id, target))
+            target = parent
+        path.reverse()
+        return path
+
+    def path_from(self, person_id):
+        if person_id not in self.parents:
+            return None
+        path = []
+        while self.parents[person_id] is not None:
+            movie_id, parent = self.parents[person_id]
+            path.append((movie_id, parent))
+            person_id = parent
+        return path
+
+
+def build_tree(source):
+    if degrees.graph is not None:
+        return ArrayTree(degrees.graph, source)
+    return DictTree(source)
@@ -0,0 +1,72 @@
+from array import array
+from collections import Counter
+
+
+class ComponentIndex():
+    """
+    Connected component label of every person, so that two people in
+    different components can be told apart without searching.
+
+    labels[p] is the component of person index p (as numbered in the
+    `Graph`), and sizes[c] the number of people in component c.
+    Components are numbered from largest to smallest.
+    """
+
+    def __init__(self, person_index, labels, sizes):
+        self.person_index = person_index
+        self.labels = labels
+        self.sizes = sizes
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Union-find over the stars of every movie.
+        """
+        n = len(graph.person_ids)
+        parent = array("i", range(n))
+
+        def find(p):
+            while parent[p] != p:
+                # path halving
+                parent[p] = parent[parent[p]]
+                p = parent[p]
+            return p
+
+        movie_offsets, movie_people = graph.movie_offsets, graph.movie_people
+        for m in range(len(graph.movie_ids)):
+            start, end = movie_offsets[m], movie_offsets[m + 1]
+            if end - start < 2:
+                continue
+            root = find(movie_people[start])
+            for j in range(start + 1, end):
+                other = find(movie_people[j])
+                if other != root:
+                    parent[other] = root
+
+        roots = array("i", (find(p) for p in range(n)))
+        counts = Counter(roots)
+        # number components by decreasing size
+        numbering = {root: c for c, (root, _) in enumerate(counts.most_common())}
+        labels = array("i", (numbering[root] for root in roots))
+        sizes = array("i", (size for _, size in counts.most_common()))
+        return cls(graph.person_index, labels, sizes)
+
+    def component(self, person_id):
+        return self.labels[self.person_index[person_id]]
+
+    def connected(self, source, target):
+        """
+        Returns whether a path between person_ids `source` and `target`
+        exists.
+        """
+        return self.component(source) == self.component(target)
+
+    def size(self, person_id):
+        return self.sizes[self.component(person_id)]
+
+    def summary(self):
+        return {
+            "components": len(self.sizes),
+            "largest": self.sizes[0] if len(self.sizes) else 0,
+            "singletons": sum(1 for size in self.sizes if size == 1),
+        }
@@ -1,6 +1,16 @@
+import argparse
 import csv
+import hashlib
+import itertools
 import sys
+from array import array
+from collections import Counter
 
+import snapshot
+import weighted
+from components import ComponentIndex
+from graph import Graph
+from nameindex import NameIndex
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,55 +22,311 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact CSR form of the stars when loaded with compact=True. In that case
+# the "movies" and "stars" sets above are not built.
+graph = None
 
-def load_data(directory):
+# Connected component of every person, built at load time
+component_index = None
+
+# Sorted index over the keys of `names` for prefix and typo-tolerant lookup
+name_index = None
+
+# Version of the data load_data saves in a snapshot. Bump it whenever the
+# parsed layout or the filtering changes, so older snapshots are rebuilt.
+SNAPSHOT_FORMAT = 1
+
+# Counts of loaded, filtered and dangling rows from the last load_data
+load_stats = Counter()
+
+
+def load_data(directory, compact=False, use_snapshot=True,
+              min_year=None, max_year=None, person_ids=None):
     """
     Load data from CSV files into memory.
+
+    With `compact`, who starred in what is stored as integer arrays
+    in `graph` instead of sets inside `people` and `movies`.
+
+    With `use_snapshot`, the parsed data is saved to a binary snapshot
+    in `directory`, and later calls load that snapshot instead of the
+    CSV files as long as the files have not changed.
+
+    `min_year`/`max_year` keep only movies from those years (and the
+    people who starred in them), and `person_ids` keeps only the given
+    people. Counts of loaded, filtered and dangling rows are stored in
+    `load_stats`.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    global graph, component_index, name_index, load_stats
+    graph = None
+    component_index = None
+    name_index = None
+
+    if use_snapshot:
+        key = snapshot.source_key(directory, SNAPSHOT_FORMAT)
+        if min_year is not None or max_year is not None or person_ids is not None:
+            key.append(_filter_key(min_year, max_year, person_ids))
+        path = snapshot.snapshot_path(directory, key)
+        data = snapshot.read_snapshot(path, key)
+        if data is not None:
+            load_snapshot(*data, compact=compact)
+            return
+
+    load_stats = load_csv(directory, compact, min_year, max_year, person_ids)
+
+    g = graph if graph is not None else Graph.from_dicts(people, movies)
+    component_index = ComponentIndex.from_graph(g)
+    name_index = NameIndex.from_names(names)
+
+    if use_snapshot:
+        try:
+            save_snapshot(path, key, g)
+        except OSError:
+            # read-only data directory, just parse the CSV files next time
+            pass
+
+
+def _filter_key(min_year, max_year, person_ids):
+    """
+    Snapshot key entry describing the load filters.
+    """
+    digest = None
+    if person_ids is not None:
+        digest = hashlib.sha1("\n".join(sorted(person_ids)).encode()).hexdigest()
+    return ("filters", min_year, max_year, digest)
+
+
+def read_rows(directory, filename, columns):
+    """
+    Yields the given columns of each row of a CSV file as tuples,
+    reading the file as a stream.
+    """
+    with open(f"{directory}/{filename}", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(column) for column in columns]
         for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+            yield tuple(row[i] for i in positions)
+
+
+def in_years(year, min_year, max_year):
+    try:
+        year = int(year)
+    except ValueError:
+        return min_year is None and max_year is None
+    return ((min_year is None or year >= min_year) and
+            (max_year is None or year <= max_year))
+
+
+def load_csv(directory, compact, min_year=None, max_year=None, person_ids=None):
+    """
+    Stream people.csv, movies.csv and stars.csv row by row, keeping
+    only what passes the filters.
+
+    Returns a Counter of loaded rows, rows dropped by a filter, and
+    dangling stars rows that refer to an unknown person or movie.
+    """
+    global graph
+    counts = Counter()
+    by_year = min_year is not None or max_year is not None
+
+    # Load people
+    for person_id, name, birth in read_rows(directory, "people.csv", ("id", "name", "birth")):
+        if person_ids is not None and person_id not in person_ids:
+            counts["people filtered"] += 1
+            continue
+        people[person_id] = {
+            "name": name,
+            "birth": birth,
+        }
+        if not compact:
+            people[person_id]["movies"] = set()
+        if name.lower() not in names:
+            names[name.lower()] = {person_id}
+        else:
+            names[name.lower()].add(person_id)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+    filtered_movies = set()
+    for movie_id, title, year in read_rows(directory, "movies.csv", ("id", "title", "year")):
+        if by_year and not in_years(year, min_year, max_year):
+            # remembered so stars rows for it count as filtered, not dangling
+            filtered_movies.add(movie_id)
+            counts["movies filtered"] += 1
+            continue
+        movies[movie_id] = {
+            "title": title,
+            "year": year,
+        }
+        if not compact:
+            movies[movie_id]["stars"] = set()
 
     # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    if compact:
+        person_index = {person_id: i for i, person_id in enumerate(people)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movies)}
+        edge_people = array("i")
+        edge_movies = array("i")
+    for person_id, movie_id in read_rows(directory, "stars.csv", ("person_id", "movie_id")):
+        if movie_id in filtered_movies or (person_ids is not None and person_id not in person_ids):
+            counts["stars filtered"] += 1
+        elif person_id not in people or movie_id not in movies:
+            counts["stars dangling"] += 1
+        elif compact:
+            counts["stars"] += 1
+            edge_people.append(person_index[person_id])
+            edge_movies.append(movie_index[movie_id])
+        else:
+            counts["stars"] += 1
+            people[person_id]["movies"].add(movie_id)
+            movies[movie_id]["stars"].add(person_id)
+    del filtered_movies
+
+    if compact:
+        starred = bytearray(len(person_index))
+        for p in edge_people:
+            starred[p] = 1
+        del person_index
+    else:
+        starred = [bool(person["movies"]) for person in people.values()]
+
+    # people without a movie in the selected years are dropped
+    if by_year:
+        keep = array("i", [-1]) * len(starred)
+        kept = 0
+        for p, person_id in enumerate(list(people)):
+            if starred[p]:
+                keep[p] = kept
+                kept += 1
+            else:
+                _remove_person(person_id)
+                counts["people filtered"] += 1
+        if compact:
+            edge_people = array("i", (keep[p] for p in edge_people))
+
+    if compact:
+        graph = Graph.from_edges(list(people), list(movies), edge_people, edge_movies,
+                                 movie_index=movie_index)
+    counts["people"] = len(people)
+    counts["movies"] = len(movies)
+    return counts
+
+
+def _remove_person(person_id):
+    name = people.pop(person_id)["name"].lower()
+    names[name].discard(person_id)
+    if not names[name]:
+        del names[name]
+
+
+def save_snapshot(path, key, g):
+    """
+    Save the loaded data, with its CSR graph `g`, as a snapshot tagged
+    with the CSV `key`.
+    """
+    arrays = {
+        "person_offsets": g.person_offsets,
+        "person_movies": g.person_movies,
+        "movie_offsets": g.movie_offsets,
+        "movie_people": g.movie_people,
+        "component_labels": component_index.labels,
+        "component_sizes": component_index.sizes,
+    }
+    objects = {
+        "people": [(person_id, person["name"], person["birth"])
+                   for person_id, person in people.items()],
+        "movies": [(movie_id, movie["title"], movie["year"])
+                   for movie_id, movie in movies.items()],
+        "name_keys": name_index.keys,
+        "load_stats": dict(load_stats),
+    }
+    snapshot.write_snapshot(path, key, arrays, objects)
+
+
+def load_snapshot(arrays, objects, compact):
+    """
+    Fill `names`, `people`, `movies`, `graph`, `component_index` and
+    `name_index` from a snapshot. The graph arrays stay memory-mapped.
+    """
+    global graph, component_index, name_index, load_stats
+
+    load_stats = Counter(objects.get("load_stats", {}))
+    for person_id, name, birth in objects["people"]:
+        people[person_id] = {"name": name, "birth": birth}
+        names.setdefault(name.lower(), set()).add(person_id)
+    for movie_id, title, year in objects["movies"]:
+        movies[movie_id] = {"title": title, "year": year}
+    if "name_keys" in objects:
+        name_index = NameIndex(objects["name_keys"])
+    else:
+        name_index = NameIndex.from_names(names)
+
+    g = Graph([row[0] for row in objects["people"]],
+              [row[0] for row in objects["movies"]],
+              arrays["person_offsets"], arrays["person_movies"],
+              arrays["movie_offsets"], arrays["movie_people"])
+    if "component_labels" in arrays:
+        component_index = ComponentIndex(g.person_index, arrays["component_labels"],
+                                         arrays["component_sizes"])
+    else:
+        component_index = ComponentIndex.from_graph(g)
+
+    if compact:
+        graph = g
+        return
+
+    # rebuild the sets from the adjacency arrays
+    person_ids, movie_ids = g.person_ids, g.movie_ids
+    for p, person_id in enumerate(person_ids):
+        people[person_id]["movies"] = {
+            movie_ids[g.person_movies[k]]
+            for k in range(g.person_offsets[p], g.person_offsets[p + 1])
+        }
+    for m, movie_id in enumerate(movie_ids):
+        movies[movie_id]["stars"] = {
+            person_ids[g.movie_people[k]]
+            for k in range(g.movie_offsets[m], g.movie_offsets[m + 1])
+        }
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        usage="python degrees.py [--bidirectional] [--compact] [--no-snapshot] "
+              "[--paths K] [--min-year Y] [--max-year Y] [--people-file FILE] "
+              "[--prefer-recent] [--exclude-movie ID] [--exclude-person ID] [directory]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--compact", action="store_true",
+                        help="store the graph as integer arrays")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_false",
+                        help="always parse the CSV files")
+    parser.add_argument("--paths", type=int, default=1, metavar="K",
+                        help="show up to K different shortest connections")
+    parser.add_argument("--min-year", type=int, help="only load movies from this year on")
+    parser.add_argument("--max-year", type=int, help="only load movies up to this year")
+    parser.add_argument("--people-file", help="only load the person_ids listed in this file")
+    parser.add_argument("--prefer-recent", action="store_true",
+                        help="find the cheapest path where older movies cost more")
+    parser.add_argument("--exclude-movie", action="append", default=[], metavar="ID",
+                        help="never connect through this movie_id")
+    parser.add_argument("--exclude-person", action="append", default=[], metavar="ID",
+                        help="never connect through this person_id")
+    args = parser.parse_args()
+    directory = args.directory
+
+    person_ids = None
+    if args.people_file:
+        with open(args.people_file, encoding="utf-8") as f:
+            person_ids = {line.strip() for line in f if line.strip()}
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, compact=args.compact, use_snapshot=args.snapshot,
+              min_year=args.min_year, max_year=args.max_year, person_ids=person_ids)
     print("Data loaded.")
+    if args.min_year or args.max_year or person_ids is not None:
+        print(", ".join(f"{count} {what}" for what, count in sorted(load_stats.items())))
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,28 +335,62 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if args.paths > 1:
+        paths = list(k_shortest_paths(source, target, args.paths))
+        if not paths:
+            print("Not connected.")
+        for number, path in enumerate(paths, 1):
+            print(f"Connection {number}:")
+            print_path(source, path)
+        return
+
+    if args.prefer_recent or args.exclude_movie or args.exclude_person:
+        cost = weighted.by_year(movies) if args.prefer_recent else None
+        g = graph if graph is not None else Graph.from_dicts(people, movies)
+        path = weighted.cheapest_path(g, source, target, cost,
+                                      args.exclude_movie, args.exclude_person)
+    else:
+        path = shortest_path(source, target, bidirectional=args.bidirectional)
 
     if path is None:
         print("Not connected.")
     else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print_path(source, path)
 
 
-def shortest_path(source, target):
+def print_path(source, path):
+    degrees = len(path)
+    print(f"{degrees} degrees of separation.")
+    path = [(None, source)] + path
+    for i in range(degrees):
+        person1 = people[path[i][1]]["name"]
+        person2 = people[path[i + 1][1]]["name"]
+        movie = movies[path[i + 1][0]]["title"]
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+
+
+def shortest_path(source, target, bidirectional=False, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    With `bidirectional` the search runs from both ends at once.
+    If `stats` is a dict, the number of expanded people is stored
+    in stats["expanded"].
+
+    People in different components are rejected without searching.
     """
+    if component_index is not None and not component_index.connected(source, target):
+        if stats is not None:
+            stats["expanded"] = 0
+        return None
+    if bidirectional:
+        return bidirectional_shortest_path(source, target, stats)
+    if graph is not None:
+        return graph.shortest_path(source, target, stats)
+
     #Node-state =>people-id, Node-parent=>people-id of parent, Node-action=>movie-id(s)
     start = Node(state=source, parent=None, action=None)
     frontier = QueueFrontier()
@@ -101,6 +401,8 @@ def shortest_path(source, target):
     while True:
 
         if frontier.empty():
+            if stats is not None:
+                stats["expanded"] = len(explored)
             return None
         
         node = frontier.remove()
@@ -118,7 +420,9 @@ def shortest_path(source, target):
             actions.reverse()
             cells.reverse()
             Loesungsweg.reverse()
-            
+
+            if stats is not None:
+                stats["expanded"] = len(explored)
             return Loesungsweg
 
         #Noch kein Lösungsweg gefunden:
@@ -130,18 +434,186 @@ def shortest_path(source, target):
                 frontier.add(child)
             
 
-    # TODO
-    #raise NotImplementedError
+
+
+def bidirectional_shortest_path(source, target, stats=None):
+    """
+    Same result format as `shortest_path`, but searches breadth-first
+    from `source` and `target` at the same time, one whole layer at a
+    time, always growing the smaller side. The searches meet in the
+    middle, so far fewer people are expanded on large graphs.
+    """
+    if source == target:
+        if stats is not None:
+            stats["expanded"] = 0
+        return []
+
+    # person_id -> (movie_id, person_id one step closer to that side's start)
+    parents_forward = {source: None}
+    parents_backward = {target: None}
+    layer_forward = [source]
+    layer_backward = [target]
+    expanded = 0
+
+    while layer_forward and layer_backward:
+
+        # grow the side with the smaller frontier
+        if len(layer_forward) <= len(layer_backward):
+            layer, parents, other = layer_forward, parents_forward, parents_backward
+        else:
+            layer, parents, other = layer_backward, parents_backward, parents_forward
+
+        next_layer = []
+        meeting = []
+        for person_id in layer:
+            expanded += 1
+            for movie_id, neighbor in neighbors_for_person(person_id):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie_id, person_id)
+                next_layer.append(neighbor)
+                if neighbor in other:
+                    meeting.append(neighbor)
+
+        if parents is parents_forward:
+            layer_forward = next_layer
+        else:
+            layer_backward = next_layer
+
+        if meeting:
+            if stats is not None:
+                stats["expanded"] = expanded
+            # every meeting person lies on a shortest path; pick the one
+            # closest to the start of the other side
+            best = min(meeting, key=lambda p: _depth(other, p))
+            return _join_paths(parents_forward, parents_backward, best)
+
+    if stats is not None:
+        stats["expanded"] = expanded
+    return None
+
+
+def _depth(parents, person_id):
+    depth = 0
+    while parents[person_id] is not None:
+        person_id = parents[person_id][1]
+        depth += 1
+    return depth
+
+
+def _join_paths(parents_forward, parents_backward, middle):
+    """
+    Builds the (movie_id, person_id) path through `middle` from the
+    parent pointers of both searches.
+    """
+    path = []
+    person_id = middle
+    while parents_forward[person_id] is not None:
+        movie_id, previous = parents_forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = previous
+    path.reverse()
+
+    person_id = middle
+    while parents_backward[person_id] is not None:
+        movie_id, following = parents_backward[person_id]
+        path.append((movie_id, following))
+        person_id = following
+    return path
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connects the source to the target, one at a time.
+
+    A layered breadth-first search records, for each person, all
+    (movie_id, person_id) steps from the previous layer. The paths are
+    then generated by walking these predecessors back from the target,
+    so they are never all held in memory at once.
+    """
+    if component_index is not None and not component_index.connected(source, target):
+        return
+    if source == target:
+        yield []
+        return
+
+    depth = {source: 0}
+    predecessors = {}
+    layer = [source]
+    d = 0
+    while layer and target not in depth:
+        d += 1
+        next_layer = []
+        for person_id in layer:
+            for movie_id, neighbor in neighbors_for_person(person_id):
+                if neighbor not in depth:
+                    depth[neighbor] = d
+                    predecessors[neighbor] = [(movie_id, person_id)]
+                    next_layer.append(neighbor)
+                elif depth[neighbor] == d:
+                    predecessors[neighbor].append((movie_id, person_id))
+        layer = next_layer
+
+    if target not in depth:
+        return
+
+    # depth-first walk from the target back to the source; steps[i] is the
+    # (movie_id, person_id) step into the person of stack[i + 1]
+    stack = [iter(predecessors[target])]
+    people_on_stack = [target]
+    steps = []
+    while stack:
+        step = next(stack[-1], None)
+        if step is None:
+            stack.pop()
+            people_on_stack.pop()
+            if steps:
+                steps.pop()
+            continue
+        movie_id, previous = step
+        steps.append((movie_id, people_on_stack[-1]))
+        if previous == source:
+            yield steps[::-1]
+            steps.pop()
+        else:
+            stack.append(iter(predecessors[previous]))
+            people_on_stack.append(previous)
+
+
+def k_shortest_paths(source, target, k):
+    """
+    Yields up to `k` of the shortest paths from `all_shortest_paths`.
+    All of them have the minimum number of degrees.
+    """
+    return itertools.islice(all_shortest_paths(source, target), k)
 
 
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If the name is unknown, similar names are suggested and
+    another name can be entered.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
-        return None
+        if name_index is None:
+            return None
+        suggestions = name_index.search(name, limit=5)
+        if not suggestions:
+            return None
+        print(f"'{name}' not found. Did you mean:")
+        for suggestion in suggestions:
+            print(f"  {people[next(iter(names[suggestion]))]['name']}")
+        try:
+            name = input("Name: ")
+        except EOFError:
+            return None
+        if not name:
+            return None
+        return person_id_for_name(name)
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
@@ -165,6 +637,8 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,266 @@
+from array import array
+from collections import deque
+
+
+class Graph():
+    """
+    Compact co-star graph in compressed sparse row (CSR) form.
+
+    People and movies are numbered 0..n-1 in load order. The movies of
+    person p are person_movies[person_offsets[p]:person_offsets[p + 1]],
+    and the stars of movie m are
+    movie_people[movie_offsets[m]:movie_offsets[m + 1]].
+    The four arrays can be `array('i')` objects or int32 memoryviews.
+    """
+
+    def __init__(self, person_ids, movie_ids,
+                 person_offsets, person_movies, movie_offsets, movie_people,
+                 person_index=None, movie_index=None):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+        if person_index is None:
+            person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        if movie_index is None:
+            movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.person_index = person_index
+        self.movie_index = movie_index
+
+    @classmethod
+    def from_edges(cls, person_ids, movie_ids, edge_people, edge_movies,
+                   person_index=None, movie_index=None):
+        """
+        Builds the graph from parallel arrays of (person, movie) index
+        pairs, one pair per row of stars.csv.
+        """
+        person_offsets, person_movies = _csr(len(person_ids), edge_people, edge_movies)
+        movie_offsets, movie_people = _csr(len(movie_ids), edge_movies, edge_people)
+        return cls(person_ids, movie_ids,
+                   person_offsets, person_movies, movie_offsets, movie_people,
+                   person_index, movie_index)
+
+    @classmethod
+    def from_dicts(cls, people, movies):
+        """
+        Builds the graph from the `people` and `movies` dictionaries
+        of degrees.py.
+        """
+        person_ids = list(people)
+        movie_ids = list(movies)
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edge_people = array("i")
+        edge_movies = array("i")
+        for person_id, person in people.items():
+            p = person_index[person_id]
+            for movie_id in person["movies"]:
+                edge_people.append(p)
+                edge_movies.append(movie_index[movie_id])
+        return cls.from_edges(person_ids, movie_ids, edge_people, edge_movies,
+                              person_index, movie_index)
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def nbytes(self):
+        """
+        Returns the size in bytes of the adjacency arrays.
+        """
+        return sum(
+            len(a) * a.itemsize
+            for a in (self.person_offsets, self.person_movies,
+                      self.movie_offsets, self.movie_people)
+        )
+
+    def neighbors(self, p):
+        """
+        Yields (movie, person) index pairs for people who starred with
+        person index `p`.
+        """
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_people = self.movie_offsets, self.movie_people
+        for k in range(person_offsets[p], person_offsets[p + 1]):
+            m = person_movies[k]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                yield m, movie_people[j]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Same as degrees.neighbors_for_person, using the CSR arrays.
+        """
+        return {
+            (self.movie_ids[m], self.person_ids[q])
+            for m, q in self.neighbors(self.person_index[person_id])
+        }
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Breadth-first search over the integer arrays between person_ids
+        `source` and `target`. Returns a list of (movie_id, person_id)
+        pairs like degrees.shortest_path, or None if not connected.
+        """
+        s = self.person_index[source]
+        t = self.person_index[target]
+        parent, via, expanded = self.bfs(s, t)
+        if stats is not None:
+            stats["expanded"] = expanded
+        if parent[t] == -1:
+            return None
+        return self.path(parent, via, s, t)
+
+    def bfs(self, s, t=-1, blocked_movies=(), blocked_people=()):
+        """
+        Breadth-first search from person index `s`, stopping once `t` is
+        reached (or covering the whole component if `t` is -1).
+        Movies and people whose indices are in `blocked_movies` and
+        `blocked_people` are never passed through.
+
+        Returns (parent, via, expanded): parent[p] is the person index p
+        was reached from (-1 if unreached, s for s itself), via[p] the
+        movie index linking them, and expanded the number of people
+        whose movies were scanned.
+        """
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_people = self.movie_offsets, self.movie_people
+
+        parent = array("i", [-1]) * len(self.person_ids)
+        via = array("i", [-1]) * len(self.person_ids)
+        # each movie's cast only has to be scanned once
+        scanned = bytearray(len(self.movie_ids))
+        # blocked entries are marked up front so the loop needs no extra test
+        for m in blocked_movies:
+            scanned[m] = 1
+        for p in blocked_people:
+            parent[p] = -2
+        parent[s] = s
+        queue = deque([s])
+        expanded = 0
+
+        if s == t:
+            return parent, via, expanded
+
+        while queue:
+            p = queue.popleft()
+            expanded += 1
+            for k in range(person_offsets[p], person_offsets[p + 1]):
+                m = person_movies[k]
+                if scanned[m]:
+                    continue
+                scanned[m] = 1
+                for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                    q = movie_people[j]
+                    if parent[q] == -1:
+                        parent[q] = p
+                        via[q] = m
+                        if q == t:
+                            return parent, via, expanded
+                        queue.append(q)
+
+        return parent, via, expanded
+
+    def bidirectional_bfs(self, s, t, blocked_movies=(), blocked_people=()):
+        """
+        Same result as `bfs` towards `t`, but searching from `s` and `t`
+        at once, one whole layer at a time on the side with the smaller
+        layer. Once the two searches meet, the path from the meeting
+        person on to `t` is written into `parent` and `via`, so `path`
+        walks it just like after `bfs`.
+        """
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_people = self.movie_offsets, self.movie_people
+
+        # parent, via and scanned movies of the searches from s and from t
+        sides = []
+        for start in (s, t):
+            parent = array("i", [-1]) * len(self.person_ids)
+            via = array("i", [-1]) * len(self.person_ids)
+            scanned = bytearray(len(self.movie_ids))
+            for m in blocked_movies:
+                scanned[m] = 1
+            for p in blocked_people:
+                parent[p] = -2
+            parent[start] = start
+            sides.append((parent, via, scanned))
+        layers = [[s], [t]]
+        expanded = 0
+
+        if s == t:
+            return sides[0][0], sides[0][1], expanded
+
+        while layers[0] and layers[1]:
+            side = 0 if len(layers[0]) <= len(layers[1]) else 1
+            parent, via, scanned = sides[side]
+            other = sides[1 - side][0]
+            next_layer = []
+            meeting = []
+            for p in layers[side]:
+                expanded += 1
+                for k in range(person_offsets[p], person_offsets[p + 1]):
+                    m = person_movies[k]
+                    if scanned[m]:
+                        continue
+                    scanned[m] = 1
+                    for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                        q = movie_people[j]
+                        if parent[q] == -1:
+                            parent[q] = p
+                            via[q] = m
+                            next_layer.append(q)
+                            if other[q] >= 0:
+                                meeting.append(q)
+            layers[side] = next_layer
+
+            if meeting:
+                # everyone met in this layer is as far from this side's
+                # start, so the one closest to the other start is best
+                q = min(meeting, key=lambda p: _depth(other, p))
+                (parent, via, _), (back, back_via, _) = sides
+                while q != t:
+                    parent[back[q]] = q
+                    via[back[q]] = back_via[q]
+                    q = back[q]
+                return parent, via, expanded
+
+        return sides[0][0], sides[0][1], expanded
+
+    def path(self, parent, via, s, t):
+        """
+        Walks the BFS tree from `t` back to `s` and returns the
+        (movie_id, person_id) path from `s` to `t`.
+        """
+        path = []
+        while t != s:
+            path.append((self.movie_ids[via[t]], self.person_ids[t]))
+            t = parent[t]
+        path.reverse()
+        return path
+
+
+def _depth(parent, p):
+    depth = 0
+    while parent[p] != p:
+        p = parent[p]
+        depth += 1
+    return depth
+
+
+def _csr(n, rows, cols):
+    """
+    Counting sort of (rows[i], cols[i]) pairs into CSR offsets and
+    column arrays for `n` rows.
+    """
+    offsets = array("i", [0]) * (n + 1)
+    for r in rows:
+        offsets[r + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+
+    cursor = array("i", offsets)
+    columns = array("i", [0]) * len(cols)
+    for r, c in zip(rows, cols):
+        columns[cursor[r]] = c
+        cursor[r] += 1
+    return offsets, columns
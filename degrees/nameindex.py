@@ -0,0 +1,245 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+# Sorts after every character, so prefix + END bounds all keys with that prefix
+END = "\U0010ffff"
+
+# Fuzzy lookups with the same number of edits that scan the sorted keys
+# before a segment index is built for that number of edits
+INDEX_AFTER = 100
+
+
+class NameIndex():
+    """
+    Sorted index of lowercase names for prefix and typo-tolerant lookup.
+
+    The sorted list doubles as an implicit trie: neighbouring keys share
+    prefixes, so the edit-distance search reuses the dynamic programming
+    rows of the shared prefix and skips every key below a prefix that is
+    already too far from the query.
+
+    That scan still visits every prefix within reach of the query, which
+    on 829k names takes about 5 ms for one edit and 50 ms for two. Once
+    `index_after` lookups with the same number of edits have scanned, a
+    segment index is built for it instead: every name is cut into one
+    more segment than there are edits, and a name within reach of the
+    query has a segment that occurs unchanged in the query at nearly the
+    same position. Only the names found that way are checked. On those
+    829k names that cuts lookups to about 0.6 ms for one edit and 20 ms
+    for two, after about 3 s of building per number of edits.
+    """
+
+    def __init__(self, keys, index_after=INDEX_AFTER):
+        self.keys = keys
+        self.index_after = index_after
+        # segment index by number of edits, and scans by number of edits
+        self.segments = {}
+        self.scans = Counter()
+
+    @classmethod
+    def from_names(cls, names, index_after=INDEX_AFTER):
+        return cls(sorted(names), index_after)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` names starting with `prefix`, in sorted order.
+        """
+        prefix = prefix.lower()
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + END, start)
+        return self.keys[start:min(end, start + limit)]
+
+    def fuzzy(self, query, max_edits=2, limit=10):
+        """
+        Returns up to `limit` (distance, name) pairs for the names within
+        `max_edits` insertions, deletions or substitutions of `query`,
+        closest first.
+        """
+        query = query.lower()
+        segments = self.segments.get(max_edits)
+        if segments is None and max_edits > 0 and self.index_after is not None:
+            self.scans[max_edits] += 1
+            if self.scans[max_edits] > self.index_after:
+                segments = self.build_segments(max_edits)
+        if segments is None:
+            matches = self._scan(query, max_edits)
+        else:
+            matches = self._lookup(segments, query, max_edits)
+        matches.sort()
+        return matches[:limit]
+
+    def build_segments(self, max_edits):
+        """
+        Builds the segment index for lookups with `max_edits` edits: a
+        dict of (length, segment number, segment) to the positions of the
+        names with that segment.
+        """
+        segments = {}
+        for k, key in enumerate(self.keys):
+            length = len(key)
+            for i, (start, size) in enumerate(_segments(length, max_edits + 1)):
+                entry = (length, i, key[start:start + size])
+                positions = segments.get(entry)
+                if positions is None:
+                    positions = segments[entry] = array("i")
+                positions.append(k)
+        self.segments[max_edits] = segments
+        return segments
+
+    def _lookup(self, segments, query, max_edits):
+        n = len(query)
+        candidates = set()
+        for length in range(max(n - max_edits, 0), n + max_edits + 1):
+            shift = n - length
+            for i, (start, size) in enumerate(_segments(length, max_edits + 1)):
+                # segment i moves by at most i edits before it and by at
+                # most the remaining edits after it (Li et al., PassJoin)
+                low = max(start - i, start + shift - (max_edits - i), 0)
+                high = min(start + i, start + shift + (max_edits - i), n - size)
+                for position in range(low, high + 1):
+                    found = segments.get((length, i, query[position:position + size]))
+                    if found is not None:
+                        candidates.update(found)
+
+        masks = _masks(query)
+        matches = []
+        for k in candidates:
+            key = self.keys[k]
+            distance = _distance(n, masks, key)
+            if distance <= max_edits:
+                matches.append((distance, key))
+        return matches
+
+    def _scan(self, query, max_edits):
+        keys = self.keys
+        n = len(query)
+
+        # rows[d] is the edit distance row of the query against the
+        # first d characters of the current key
+        rows = [list(range(n + 1))]
+        previous = ""
+        matches = []
+        i = 0
+        while i < len(keys):
+            key = keys[i]
+            shared = _common_prefix(previous, key, len(rows) - 1)
+            del rows[shared + 1:]
+            previous = key
+
+            pruned = False
+            for d in range(shared, len(key)):
+                char = key[d]
+                above = rows[d]
+                row = [above[0] + 1]
+                for j in range(1, n + 1):
+                    row.append(min(
+                        row[j - 1] + 1,
+                        above[j] + 1,
+                        above[j - 1] + (query[j - 1] != char),
+                    ))
+                rows.append(row)
+                if min(row) > max_edits:
+                    # no name starting with key[:d + 1] can match
+                    i = bisect_left(keys, key[:d + 1] + END, i + 1)
+                    pruned = True
+                    break
+            if pruned:
+                continue
+
+            distance = rows[len(key)][n]
+            if distance <= max_edits:
+                matches.append((distance, key))
+            i += 1
+        return matches
+
+    def search(self, query, limit=10, max_edits=2):
+        """
+        Returns up to `limit` candidate names for `query`: an exact match
+        first, then names starting with `query` (shortest first), then
+        the closest names within `max_edits` typos.
+        """
+        query = query.lower()
+        candidates = []
+        seen = set()
+
+        def add(name):
+            if name not in seen:
+                seen.add(name)
+                candidates.append(name)
+
+        # rank a bounded number of completions so short prefixes stay fast
+        completions = self.prefix(query, limit=max(limit, 1000))
+        for name in sorted(completions, key=len)[:limit]:
+            add(name)
+        # widen the search one edit at a time; tighter searches prune more
+        for edits in range(max_edits + 1):
+            matches = self.fuzzy(query, edits, limit)
+            if matches:
+                for _, name in matches:
+                    add(name)
+                break
+        return candidates[:limit]
+
+
+def _common_prefix(a, b, limit):
+    n = min(len(a), len(b), limit)
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _segments(length, parts):
+    """
+    Yields the (start, size) of `parts` segments of a string of `length`
+    characters, the longer ones last.
+    """
+    size, longer = divmod(length, parts)
+    start = 0
+    for i in range(parts):
+        segment = size + (i >= parts - longer)
+        yield start, segment
+        start += segment
+
+
+def _masks(query):
+    """
+    Maps each character of `query` to a bit mask of where it occurs.
+    """
+    masks = {}
+    for i, char in enumerate(query):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def _distance(n, masks, key):
+    """
+    Returns the edit distance between `key` and a query of length `n`
+    with the character `masks` of `_masks`, using the bit-parallel
+    algorithm of Myers in the form given by Hyyro.
+    """
+    if n == 0:
+        return len(key)
+    full = (1 << n) - 1
+    last = 1 << (n - 1)
+    up, down = full, 0
+    distance = n
+    for char in key:
+        eq = masks.get(char, 0)
+        xv = eq | down
+        xh = (((eq & up) + up) ^ up) | eq
+        right_up = down | ~(xh | up)
+        right_down = up & xh
+        if right_up & last:
+            distance += 1
+        elif right_down & last:
+            distance -= 1
+        right_up = ((right_up << 1) | 1) & full
+        right_down = (right_down << 1) & full
+        up = right_down | (~(xv | right_up) & full)
+        down = right_up & xv
+    return distance
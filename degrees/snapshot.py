@@ -0,0 +1,115 @@
+"""
+Binary snapshot of the parsed degrees data.
+
+A snapshot file is a line with its magic, a line of JSON header and
+then the raw int32 arrays and a JSON object, back to back. The header
+lists where each of them is and the mtime and size of the CSV files the
+snapshot was built from, so a stale snapshot is never used. On reading,
+the file is memory-mapped and the arrays are returned as memoryviews
+into the mapping, so nothing is copied until it is touched.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+
+MAGIC = b"DEGSNAP3\n"
+FILENAME = "degrees.snapshot"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+
+def snapshot_path(directory, key=None):
+    """
+    Returns where the snapshot for `directory` is stored. Loads with
+    filters (an extra entry in `key`) get a snapshot file of their own.
+    """
+    extra = key[1 + len(SOURCES):] if key is not None else None
+    if not extra:
+        return os.path.join(directory, FILENAME)
+    digest = hashlib.sha1(repr(extra).encode()).hexdigest()[:12]
+    return os.path.join(directory, f"{FILENAME}.{digest}")
+
+
+def source_key(directory, version):
+    """
+    Returns the key a snapshot of `directory` is tagged with: the format
+    `version` of the loaded data, then the (filename, mtime, size)
+    triples of the CSV files it depends on.
+    """
+    key = [("format", version)]
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        key.append((filename, stat.st_mtime_ns, stat.st_size))
+    return key
+
+
+def write_snapshot(path, key, arrays, objects):
+    """
+    Writes `arrays` (a dict of name -> int32 array) and `objects`, which
+    must be JSON serializable, to `path`, tagged with `key`.
+
+    The file is written next to `path` first and then moved into place,
+    so a reader never sees a half written snapshot.
+    """
+    blob = json.dumps(objects).encode()
+
+    # the sections follow the header line in order, as (offset, size)
+    sections = {}
+    offset = 0
+    for name, values in arrays.items():
+        size = len(values) * values.itemsize
+        sections[name] = (offset, size)
+        offset += size
+    sections["objects"] = (offset, len(blob))
+
+    header = json.dumps({"key": key, "sections": sections}).encode()
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(header + b"\n")
+        for values in arrays.values():
+            f.write(values)
+        f.write(blob)
+    os.replace(tmp, path)
+
+
+def read_snapshot(path, key):
+    """
+    Memory-maps the snapshot at `path`.
+
+    Returns (arrays, objects), where arrays maps names to int32
+    memoryviews and tuples in `objects` come back as lists, or None if
+    there is no snapshot or it was built from different CSV files than
+    `key` describes.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+
+    with f:
+        if f.readline() != MAGIC:
+            return None
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return None
+        # JSON has no tuples, so compare in the form the key was saved in
+        key = json.loads(json.dumps(key))
+        if not isinstance(header, dict) or header.get("key") != key:
+            return None
+        start = f.tell()
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapping)
+    arrays = {}
+    objects = None
+    for name, (offset, size) in header["sections"].items():
+        section = view[start + offset:start + offset + size]
+        if name == "objects":
+            objects = json.loads(bytes(section))
+        else:
+            arrays[name] = section.cast("i")
+    return arrays, objects
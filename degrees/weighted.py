@@ -0,0 +1,213 @@
+"""
+Cheapest paths over the co-star graph with per-movie costs.
+
+Every step of a path goes through a movie, so a cost function maps a
+movie_id to the (non-negative) cost of using that movie. Movies and
+people can also be excluded altogether. When every movie costs the
+same, the cheapest path is the shortest one and the search falls back
+to the bidirectional breadth-first search of `Graph.bidirectional_bfs`.
+Otherwise it runs A*, bounding the cost still to come by the cheapest
+movie times the number of steps left.
+"""
+
+import heapq
+from array import array
+
+INFINITY = float("inf")
+
+# Share of all people the layers around the target may hold before
+# `step_bound` stops counting steps exactly
+BOUND_SHARE = 0.1
+
+
+def uniform(movie_id):
+    """
+    Every movie costs the same; the cheapest path is the shortest one.
+    """
+    return 1
+
+
+def by_year(movies, penalty=0.1, newest=None):
+    """
+    Returns a cost function that prefers recent movies: a movie costs
+    1 plus `penalty` for every year it is older than `newest` (the most
+    recent year in `movies` by default). Movies without a year are
+    treated as being 100 years old.
+    """
+    years = {}
+    for movie_id, movie in movies.items():
+        try:
+            years[movie_id] = int(movie["year"])
+        except (ValueError, TypeError):
+            pass
+    if newest is None:
+        newest = max(years.values(), default=0)
+
+    def cost(movie_id):
+        return 1 + penalty * max(newest - years.get(movie_id, newest - 100), 0)
+    return cost
+
+
+def cost_table(graph, cost):
+    """
+    Returns the cost of every movie in `graph` by movie index. Passing
+    the table to `cheapest_path` instead of `cost` saves evaluating the
+    cost function again for every search.
+    """
+    return array("d", map(cost, graph.movie_ids))
+
+
+def cheapest_path(graph, source, target, cost=None, exclude_movies=(),
+                  exclude_people=(), heuristic=None, stats=None):
+    """
+    Returns the cheapest list of (movie_id, person_id) pairs that connect
+    person_ids `source` and `target` in the CSR `graph` without using
+    any movie_id in `exclude_movies` or person_id in `exclude_people`,
+    or None if there is no such path.
+
+    `cost(movie_id)` gives the cost of a step through a movie, and can
+    also be given as a `cost_table`. If it is None, `uniform` or the
+    same for every movie, a bidirectional breadth-first search is used.
+    Otherwise the search runs as A*, with a `heuristic(person_index)`
+    that never overestimates the remaining cost if one is given, and
+    with the bound of `step_bound` if not.
+
+    If `stats` is a dict, the number of expanded people and the total
+    cost are stored in it.
+    """
+    s = graph.person_index[source]
+    t = graph.person_index[target]
+    blocked_movies = [graph.movie_index[m] for m in exclude_movies if m in graph.movie_index]
+    blocked_people = [graph.person_index[p] for p in exclude_people if p in graph.person_index]
+    if s in blocked_people or t in blocked_people:
+        return None
+
+    if cost is None or cost is uniform:
+        costs = None
+        step = 1
+    else:
+        costs = cost_table(graph, cost) if callable(cost) else cost
+        cheapest = min(costs, default=0)
+        step = cheapest if cheapest == max(costs, default=0) else None
+
+    if step is not None and heuristic is None:
+        parent, via, expanded = graph.bidirectional_bfs(s, t, blocked_movies, blocked_people)
+        path = graph.path(parent, via, s, t) if parent[t] >= 0 else None
+        total = len(path) * step if path is not None else None
+    else:
+        if costs is None:
+            costs = array("d", [1]) * len(graph.movie_ids)
+        if heuristic is None and cheapest > 0:
+            heuristic = step_bound(graph, t, cheapest)
+        parent, via, expanded, total = search(graph, s, t, costs, blocked_movies,
+                                              blocked_people, heuristic)
+        path = graph.path(parent, via, s, t) if total is not None else None
+
+    if stats is not None:
+        stats["expanded"] = expanded
+        stats["cost"] = total
+    return path
+
+
+def step_bound(graph, t, cheapest):
+    """
+    Returns an A* heuristic towards person index `t` for movies that
+    cost at least `cheapest`: `cheapest` times a lower bound on the
+    steps left. The bound is the exact number of steps within the
+    layers around `t` that fit in BOUND_SHARE of all people, and one
+    more than their last layer for everyone else. It drops by at most
+    one per step, so A* never has to reopen a person.
+    """
+    person_offsets, person_movies = graph.person_offsets, graph.person_movies
+    movie_offsets, movie_people = graph.movie_offsets, graph.movie_people
+
+    limit = max(int(len(graph.person_ids) * BOUND_SHARE), 1)
+    steps = array("i", [-1]) * len(graph.person_ids)
+    scanned = bytearray(len(graph.movie_ids))
+    steps[t] = 0
+    layer = [t]
+    depth = 0
+    size = 1
+    while layer:
+        next_layer = []
+        for p in layer:
+            for k in range(person_offsets[p], person_offsets[p + 1]):
+                m = person_movies[k]
+                if scanned[m]:
+                    continue
+                scanned[m] = 1
+                for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                    q = movie_people[j]
+                    if steps[q] == -1:
+                        steps[q] = depth + 1
+                        next_layer.append(q)
+            if size + len(next_layer) >= limit:
+                break
+        size += len(next_layer)
+        if size >= limit:
+            # the next layer may be incomplete, but everyone left out is
+            # at least depth + 1 steps away
+            break
+        layer = next_layer
+        depth += 1
+
+    def heuristic(p):
+        return cheapest * (steps[p] if steps[p] >= 0 else depth + 1)
+    return heuristic
+
+
+def search(graph, s, t, costs, blocked_movies=(), blocked_people=(), heuristic=None):
+    """
+    Dijkstra (or A* with a `heuristic`) from person index `s` to `t`
+    with a binary heap frontier. `costs` is a `cost_table`.
+
+    Returns (parent, via, expanded, total), where total is the cost of
+    the cheapest path or None if `t` cannot be reached.
+    """
+    person_offsets, person_movies = graph.person_offsets, graph.person_movies
+    movie_offsets, movie_people = graph.movie_offsets, graph.movie_people
+
+    n = len(graph.person_ids)
+    distance = array("d", [INFINITY]) * n
+    parent = array("i", [-1]) * n
+    via = array("i", [-1]) * n
+    done = bytearray(n)
+    # lowest distance each movie's cast was scanned from; scanning it
+    # again from the same or a higher distance cannot improve anything
+    entered = array("d", [INFINITY]) * len(graph.movie_ids)
+    for m in blocked_movies:
+        entered[m] = -INFINITY
+    for p in blocked_people:
+        done[p] = 1
+
+    distance[s] = 0
+    parent[s] = s
+    frontier = [(heuristic(s) if heuristic else 0, s)]
+    expanded = 0
+
+    while frontier:
+        _, p = heapq.heappop(frontier)
+        if done[p]:
+            continue
+        done[p] = 1
+        if p == t:
+            return parent, via, expanded, distance[t]
+        expanded += 1
+
+        d = distance[p]
+        for k in range(person_offsets[p], person_offsets[p + 1]):
+            m = person_movies[k]
+            if entered[m] <= d:
+                continue
+            entered[m] = d
+            nd = d + costs[m]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                q = movie_people[j]
+                if not done[q] and nd < distance[q]:
+                    distance[q] = nd
+                    parent[q] = p
+                    via[q] = m
+                    priority = nd + heuristic(q) if heuristic else nd
+                    heapq.heappush(frontier, (priority, q))
+
+    return parent, via, expanded, None
@@ -0,0 +1,501 @@
+"""
+Benchmarks for the heredity project.
+
+Usage: python benchmark.py <benchmark> [options]
+Run `python benchmark.py -h` for the list of benchmarks.
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import heredity
+from inference import exact_probabilities
+from pedigree import Pedigree
+from vectorized import BLOCK_SIZE, vectorized_probabilities
+
+# legacy_joint_probability reads the probabilities from a global
+PROBS = heredity.PROBS
+
+
+def synthetic_family(num_people, inbreeding=0.05, known_traits=0.5, seed=0):
+    """
+    Returns a random pedigree in the format of `heredity.load_data`.
+
+    The family grows generation by generation: people of the youngest
+    generation marry someone from outside the family (a new person
+    without parents), or with probability `inbreeding` a sibling or
+    cousin, and have one to four children. A fraction `known_traits` of
+    the people have a known trait.
+    """
+    rng = random.Random(seed)
+    people = {}
+
+    def add(mother=None, father=None):
+        name = f"person{len(people)}"
+        trait = rng.random() < 0.1 if rng.random() < known_traits else None
+        people[name] = {"name": name, "mother": mother, "father": father, "trait": trait}
+        return name
+
+    generation = [add() for _ in range(min(2, num_people))]
+    while len(people) < num_people:
+        children = []
+        for i, person in enumerate(generation):
+            if len(people) >= num_people:
+                break
+            # children of the same or neighbouring couples are next to
+            # each other in the generation
+            relatives = generation[max(i - 4, 0):i] + generation[i + 1:i + 5]
+            if relatives and rng.random() < inbreeding:
+                partner = rng.choice(relatives)
+            elif len(people) + 2 <= num_people:
+                partner = add()
+            else:
+                break
+            for _ in range(rng.randint(1, 4)):
+                if len(people) >= num_people:
+                    break
+                children.append(add(person, partner))
+        generation = children or [add() for _ in range(min(2, num_people - len(people)))]
+    return people
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def max_difference(a, b):
+    return max(
+        abs(a[person][field][value] - b[person][field][value])
+        for person in a for field in a[person] for value in a[person][field]
+    )
+
+
+def legacy_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    The original `heredity.joint_probability`, copied verbatim, which
+    splits the family and works out every inheritance probability again
+    on each call.
+
+    Compute and return a joint probability.
+
+    The probability returned should be the probability that
+        * everyone in set `one_gene` has one copy of the gene, and
+        * everyone in set `two_genes` has two copies of the gene, and
+        * everyone not in `one_gene` or `two_gene` does not have the gene, and
+        * everyone in set `have_trait` has the trait, and
+        * everyone not in set` have_trait` does not have the trait.
+    """
+
+    zero_gene = set()
+    for person in people:
+        if not person in one_gene and not person in two_genes:
+            zero_gene.add(person)
+
+    # persons with no known parents
+    no_parents = []
+    # persons with knwon parents
+    has_parents = []
+    for person in people:
+        if people[person]["mother"] == None and people[person]["father"] == None:
+            no_parents.append(person)
+        else:
+            has_parents.append(person)
+    
+    probs_zero_genes = []
+    probs_one_gene = []
+    probs_two_genes = []
+    # calculate probs for persons without known parents
+    for person in no_parents:
+        # calculate probs for persons with zero genes
+        if person in zero_gene:
+            # persons with zero genes and no trait
+            if not person in have_trait:
+                prob = PROBS["gene"][0] * PROBS["trait"][0][False]
+            # person with zero genes and has trait
+            else:
+                prob = PROBS["gene"][0] * PROBS["trait"][0][True]
+            
+            probs_zero_genes.append(prob)
+
+        # calculate probs for persons with one gene:
+        elif person in one_gene:
+            # person with one gene and no trait
+            if not person in have_trait:
+                prob = PROBS["gene"][1] * PROBS["trait"][1][False]
+            # person with one gene and has trait
+            else:
+                prob = PROBS["gene"][1] * PROBS["trait"][1][True]
+        
+            probs_one_gene.append(prob)
+        
+        # calculate probs for persons with two genes
+        else:
+            # person with two genes and no trait
+            if not person in have_trait:
+                prob = PROBS["gene"][2] * PROBS["trait"][2][False]
+            # person with two genes and has trait
+            else:
+                prob = PROBS["gene"][2] * PROBS["trait"][2][True]
+
+            probs_two_genes.append(prob)
+
+    #probs_genes_noParents = sum(probs_zero_genes) + sum(probs_one_gene) + sum(probs_two_genes)
+    probs_genes_noParents = probs_zero_genes + probs_one_gene + probs_two_genes
+    # print(probs_genes_noParents)
+
+    # calculate probs for persons with parents
+    probs_parents = [1-PROBS["mutation"], 0.5, PROBS["mutation"]] # 0.99, 0.5, 0.01
+
+    probs_genes_hasParents = []
+
+    for person in has_parents:
+
+        if people[person]["mother"] in zero_gene:
+            mother = 0
+        elif people[person]["mother"] in one_gene:
+            mother = 1
+        else:
+            mother = 2
+        
+        if people[person]["father"] in zero_gene:
+            father = 0
+        elif people[person]["father"] in one_gene:
+            father = 1
+        else:
+            father = 2
+        
+        # person with no gene
+        if person in zero_gene:
+
+            child = 0
+
+            prob_gene = probs_parents[mother] * probs_parents[father]
+
+            """
+            ### both parents do not have the gene
+            if people[person]["mother"] in zero_gene and people[person]["father"] in zero_gene:
+                prob_gene = (probs_parents[0])**2
+            # father has one gene, mother none OR mother has one gene, father none
+            elif people[person]["mother"] in zero_gene and people[person]["father"] in one_gene:
+                prob_gene = (1 - PROBS["mutation"]) * 0.5
+            # father has two genes, mother none
+            elif people[person]["mother"] in zero_gene and people[person]["father"] in two_genes:
+                prob_gene = (1 - PROBS["mutation"]) * PROBS["mutation"]
+            ### father has one gene, mother one
+            elif people[person]["mother"] in one_gene and people[person]["father"] in one_gene:
+                prob_gene = 0.5 * 0.5
+            # father has two genes, mother one
+            elif people[person]["mother"] in one_gene and people[person]["father"] in two_genes:
+                prob_gene = 0.5 * PROBS["mutation"]
+            ### both have two genes
+            else:
+                prob_gene = (PROBS["mutation"])**2
+            """
+        
+        # person with one gene
+        elif person in one_gene:    # 0: 0.99; 1: 0.5; 2: 0.01
+            child = 1
+            
+            if mother == 0 and father == 0:
+                prob_gene = probs_parents[2] * probs_parents[0] + probs_parents[0] * probs_parents[2]
+            elif (mother == 0 and father == 1) or (father == 0 and mother == 1):
+                prob_gene = probs_parents[2] * probs_parents[1] + probs_parents[1] * probs_parents[0]
+            elif mother == 0 and father == 2 or (father == 0 and mother == 2):
+                prob_gene = probs_parents[2] * probs_parents[2] + probs_parents[0] * probs_parents[0]
+            elif mother == 1 and father == 1:
+                prob_gene = probs_parents[1] * probs_parents[1] + probs_parents[1] * probs_parents[1]
+            elif (mother == 1 and father == 2) or (mother == 2 and father == 1):
+                prob_gene = probs_parents[1] * probs_parents[2] + probs_parents[1] * probs_parents[0]
+            else: # if mother == 2 and father == 2:
+                prob_gene = probs_parents[0] * probs_parents[2] + probs_parents[2] * probs_parents[0]
+        
+        # person with two genes
+        else:
+            child = 2
+            
+            prob_gene = probs_parents[-(1+mother)] * probs_parents[-(1+father)]
+
+        
+        # person with no trait
+        if not person in have_trait:
+            prob = prob_gene * PROBS["trait"][child][False]
+        else:
+            prob = prob_gene * PROBS["trait"][child][True]
+            
+        probs_genes_hasParents.append(prob)
+
+    # print(f"probs_genes_hasParents: {probs_genes_hasParents}")
+    probs_genes_all = probs_genes_noParents + probs_genes_hasParents
+    # print(probs_genes_all)
+
+    #joint_probs = probs_genes_noParents + sum(probs_genes_hasParents)
+    # print(joint_probs)
+
+    joint_probs = 1
+    for prob in probs_genes_all:
+        joint_probs *= prob
+    
+    return joint_probs
+
+
+def legacy_enumerate_probabilities(people, counter=None):
+    """
+    The original enumeration loop of `heredity.main`, which builds every
+    subset as a Python set through `heredity.powerset` and calls the
+    original `legacy_joint_probability`. If `counter` is a dict, the
+    number of sets built is stored in it.
+    """
+    def powerset(s):
+        subsets = heredity.powerset(s)
+        if counter is not None:
+            counter["sets"] = counter.get("sets", 0) + len(subsets)
+        return subsets
+
+    probabilities = {
+        person: {"gene": {2: 0, 1: 0, 0: 0}, "trait": {True: 0, False: 0}}
+        for person in people
+    }
+    names = set(people)
+    for have_trait in powerset(names):
+        if any(people[person]["trait"] is not None
+               and people[person]["trait"] != (person in have_trait) for person in names):
+            continue
+        for one_gene in powerset(names):
+            for two_genes in powerset(names - one_gene):
+                p = legacy_joint_probability(people, one_gene, two_genes, have_trait)
+                heredity.update(probabilities, one_gene, two_genes, have_trait, p)
+    heredity.normalize(probabilities)
+    return probabilities
+
+
+def joint_enumerate_probabilities(people):
+    """
+    The original enumeration loop of `heredity.main` with the current
+    `heredity.joint_probability`.
+    """
+    probabilities = {
+        person: {"gene": {2: 0, 1: 0, 0: 0}, "trait": {True: 0, False: 0}}
+        for person in people
+    }
+    for one_gene, two_genes, have_trait in assignments(people):
+        p = heredity.joint_probability(people, one_gene, two_genes, have_trait)
+        heredity.update(probabilities, one_gene, two_genes, have_trait, p)
+    heredity.normalize(probabilities)
+    return probabilities
+
+
+def traced(function, *args):
+    """
+    Returns (result, peak bytes allocated by Python while running).
+    """
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def assignments(people):
+    """
+    Yields every (one_gene, two_genes, have_trait) that agrees with the
+    known traits, in the order of the original enumeration loop.
+    """
+    names = set(people)
+    for have_trait in heredity.powerset(names):
+        if any(people[person]["trait"] is not None
+               and people[person]["trait"] != (person in have_trait) for person in names):
+            continue
+        for one_gene in heredity.powerset(names):
+            for two_genes in heredity.powerset(names - one_gene):
+                yield one_gene, two_genes, have_trait
+
+
+def bench_joint(args):
+    for size in args.sizes:
+        people = synthetic_family(size, seed=args.seed)
+        cases = list(assignments(people))
+
+        expected, legacy_seconds = timed(
+            lambda: [legacy_joint_probability(people, *case) for case in cases])
+        _, joint_seconds = timed(
+            lambda: [heredity.joint_probability(people, *case) for case in cases])
+
+        # the path of enumerate_probabilities: the family compiled once,
+        # and every assignment passed in as integer lists
+        names = list(people)
+        encoded = [
+            ([1 if p in one else 2 if p in two else 0 for p in names],
+             [int(p in trait) for p in names])
+            for one, two, trait in cases
+        ]
+
+        def compiled():
+            pedigree = Pedigree.from_people(people, heredity.PROBS)
+            return [pedigree.probability(genes, traits) for genes, traits in encoded]
+
+        results, seconds = timed(compiled)
+
+        error = max(abs(a - b) / b for a, b in zip(results, expected))
+        print(f"  {size:3} people, {len(cases):8} calls  "
+              f"original {legacy_seconds / len(cases) * 1e6:6.2f}us/call  "
+              f"compiled pedigree {seconds / len(cases) * 1e6:6.2f}us/call "
+              f"({legacy_seconds / seconds:4.1f}x)  "
+              f"joint_probability, compiling on every call "
+              f"{joint_seconds / len(cases) * 1e6:6.2f}us/call  "
+              f"max relative difference {error:.1e}")
+
+
+def bench_powerset(args):
+    for size in args.sizes:
+        people = synthetic_family(size, seed=args.seed)
+        counter = {}
+        expected, legacy_seconds = timed(legacy_enumerate_probabilities, people, counter)
+        _, legacy_peak = traced(legacy_enumerate_probabilities, people)
+        probabilities, seconds = timed(heredity.enumerate_probabilities, people)
+        _, peak = traced(heredity.enumerate_probabilities, people)
+        print(f"  {size:3} people  sets {counter['sets']:9} -> 0  "
+              f"peak {legacy_peak / 1024:7.1f} KiB -> {peak / 1024:6.1f} KiB  "
+              f"time {legacy_seconds:7.3f}s -> {seconds:7.3f}s "
+              f"({legacy_seconds / seconds:4.1f}x)  "
+              f"max difference {max_difference(expected, probabilities):.1e}")
+
+
+def bench_vectorized(args):
+    for size in args.sizes:
+        people = synthetic_family(size, seed=args.seed)
+        exact = exact_probabilities(people, heredity.PROBS)
+        line = f"  {size:3} people"
+
+        if size <= args.enumerate_max:
+            _, seconds = timed(heredity.enumerate_probabilities, people)
+            line += f"  enumerate {seconds:8.3f}s"
+        else:
+            line += f"  enumerate {'skipped':>9}"
+        print(line)
+
+        for block_size in args.block_sizes:
+            probabilities, seconds = timed(vectorized_probabilities, people,
+                                           heredity.PROBS, block_size)
+            tracemalloc.start()
+            vectorized_probabilities(people, heredity.PROBS, block_size)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"    blocks of {block_size:8}: {seconds:8.3f}s, "
+                  f"peak {peak / 2**20:6.1f} MiB, "
+                  f"max difference to exact {max_difference(exact, probabilities):.1e}")
+
+
+def bench_parallel(args):
+    people = synthetic_family(args.size, seed=args.seed)
+    exact = exact_probabilities(people, heredity.PROBS)
+    print(f"  {args.size} people, {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        probabilities, seconds = timed(vectorized_probabilities, people, heredity.PROBS,
+                                       workers=workers)
+        baseline = baseline or seconds
+        print(f"  {workers:3} workers {seconds:8.3f}s  speedup {baseline / seconds:5.2f}x  "
+              f"max difference to exact {max_difference(exact, probabilities):.1e}")
+
+
+def bench_exact(args):
+    for size in args.sizes:
+        people = synthetic_family(size, args.inbreeding, seed=args.seed)
+        probabilities, seconds = timed(exact_probabilities, people, heredity.PROBS)
+        line = f"  {size:6} people  exact {seconds:8.3f}s"
+
+        if size <= args.enumerate_max:
+            expected, enumerate_seconds = timed(heredity.enumerate_probabilities, people)
+            line += (f"  enumerate {enumerate_seconds:8.3f}s"
+                     f"  max difference {max_difference(expected, probabilities):.1e}")
+        print(line)
+
+
+def check_engines(args):
+    failed = False
+    for filename in sorted(glob.glob(os.path.join(args.data, "*.csv"))):
+        people = heredity.load_data(filename)
+        expected = legacy_enumerate_probabilities(people)
+
+        print(f"  {os.path.basename(filename)}: {len(people)} people")
+        for name, engine in [
+            ("joint_probability", joint_enumerate_probabilities),
+            ("enumerate", heredity.enumerate_probabilities),
+            ("exact", lambda people: exact_probabilities(people, heredity.PROBS)),
+            ("vectorized", lambda people: vectorized_probabilities(people, heredity.PROBS)),
+            ("vectorized, 2 workers",
+             lambda people: vectorized_probabilities(people, heredity.PROBS, workers=2)),
+        ]:
+            difference = max_difference(expected, engine(people))
+            ok = difference <= args.tolerance
+            failed = failed or not ok
+            print(f"    {name:22} max difference {difference:.1e}  {'ok' if ok else 'FAILED'}")
+    if failed:
+        sys.exit("Some engines differ from the original powerset enumeration.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    joint = subparsers.add_parser(
+        "joint", help="original joint_probability vs the compiled pedigree tables")
+    joint.add_argument("--sizes", type=int, nargs="+", default=[3, 5, 7])
+    joint.add_argument("--seed", type=int, default=0)
+    joint.set_defaults(run=bench_joint)
+
+    powerset = subparsers.add_parser(
+        "powerset", help="enumeration over Python sets vs lazily generated bitmasks")
+    powerset.add_argument("--sizes", type=int, nargs="+", default=[4, 6, 8])
+    powerset.add_argument("--seed", type=int, default=0)
+    powerset.set_defaults(run=bench_powerset)
+
+    vectorized = subparsers.add_parser(
+        "vectorized", help="enumeration one assignment at a time vs in NumPy blocks")
+    vectorized.add_argument("--sizes", type=int, nargs="+", default=[6, 8, 10, 12])
+    vectorized.add_argument("--block-sizes", type=int, nargs="+",
+                            default=[1 << 12, BLOCK_SIZE, 1 << 20])
+    vectorized.add_argument("--enumerate-max", type=int, default=8,
+                            help="largest family to also enumerate one by one")
+    vectorized.add_argument("--seed", type=int, default=0)
+    vectorized.set_defaults(run=bench_vectorized)
+
+    parallel = subparsers.add_parser(
+        "parallel", help="speedup of vectorized enumeration with 1..N worker processes")
+    parallel.add_argument("--size", type=int, default=12)
+    parallel.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parallel.add_argument("--seed", type=int, default=0)
+    parallel.set_defaults(run=bench_parallel)
+
+    exact = subparsers.add_parser(
+        "exact", help="junction tree inference vs enumerating every assignment")
+    exact.add_argument("--sizes", type=int, nargs="+",
+                       default=[3, 5, 7, 100, 300, 1000, 3000])
+    exact.add_argument("--enumerate-max", type=int, default=7,
+                       help="largest family to also enumerate")
+    exact.add_argument("--inbreeding", type=float, default=0.05,
+                       help="probability of marrying within the family")
+    exact.add_argument("--seed", type=int, default=0)
+    exact.set_defaults(run=bench_exact)
+
+    check_ = subparsers.add_parser(
+        "check", help="every engine against the original powerset enumeration")
+    check_.add_argument("--data", default=os.path.join(os.path.dirname(__file__), "data"),
+                        help="directory with the families to check")
+    check_.add_argument("--tolerance", type=float, default=1e-12)
+    check_.set_defaults(run=check_engines)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
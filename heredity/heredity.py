@@ -1,6 +1,9 @@
+import argparse
 import csv
 import itertools
-import sys
+
+from inference import exact_probabilities
+from pedigree import Pedigree
 
 PROBS = {
 
@@ -40,49 +43,24 @@ PROBS = {
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
-
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
-        person: {
-            "gene": {
-                2: 0,
-                1: 0,
-                0: 0
-            },
-            "trait": {
-                True: 0,
-                False: 0
-            }
-        }
-        for person in people
-    }
-
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
-
-    # Ensure probabilities sum to 1
-    normalize(probabilities)
+    parser = argparse.ArgumentParser(usage="python heredity.py [--engine ENGINE] [--workers N] data.csv")
+    parser.add_argument("data")
+    parser.add_argument("--engine", choices=["exact", "enumerate", "vectorized"],
+                        default="exact",
+                        help="exact message passing, or enumerating every assignment "
+                             "one by one or in NumPy blocks")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for the vectorized engine")
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    if args.engine == "exact":
+        probabilities = exact_probabilities(people, PROBS)
+    elif args.engine == "vectorized":
+        from vectorized import vectorized_probabilities
+        probabilities = vectorized_probabilities(people, PROBS, workers=args.workers)
+    else:
+        probabilities = enumerate_probabilities(people)
 
     # Print results
     for person in people:
@@ -94,6 +72,64 @@ def main():
                 print(f"    {value}: {p:.4f}")
 
 
+def enumerate_probabilities(people):
+    """
+    Return the normalized gene and trait distribution of every person,
+    by summing the joint probability of every assignment of genes and
+    traits that agrees with the known traits.
+
+    Sets of people are bitmasks, with bit i for the i-th person, so the
+    subsets are generated one at a time by `subsets` and membership is a
+    bit test instead of building millions of Python sets.
+    """
+    pedigree = Pedigree.from_people(people, PROBS)
+    names = pedigree.names
+    bits = range(len(names))
+    everyone = (1 << len(names)) - 1
+
+    # Bitmasks of the people known to have the trait, and of the people
+    # whose trait is unknown
+    known_trait = sum(1 << i for i in bits if people[names[i]]["trait"])
+    unknown = sum(1 << i for i in bits if people[names[i]]["trait"] is None)
+
+    # Unnormalized sums for 0, 1 and 2 copies, and for no trait and trait
+    gene_sums = [[0, 0, 0] for _ in bits]
+    trait_sums = [[0, 0] for _ in bits]
+
+    # Loop over all sets of people who might have the trait, within the
+    # known information
+    for unknown_trait in subsets(unknown):
+        have_trait = known_trait | unknown_trait
+        traits = [have_trait >> i & 1 for i in bits]
+
+        # Loop over all sets of people who might have the gene, passing
+        # the pedigree the gene counts as integers
+        total = 0
+        for one_gene in subsets(everyone):
+            for two_genes in subsets(everyone & ~one_gene):
+                genes = [(one_gene >> i & 1) + 2 * (two_genes >> i & 1) for i in bits]
+                p = pedigree.probability(genes, traits)
+                total += p
+                for sums, g in zip(gene_sums, genes):
+                    sums[g] += p
+
+        # The traits are the same for every gene assignment above
+        for sums, t in zip(trait_sums, traits):
+            sums[t] += total
+
+    probabilities = {
+        name: {
+            "gene": {2: gene_sums[i][2], 1: gene_sums[i][1], 0: gene_sums[i][0]},
+            "trait": {True: trait_sums[i][1], False: trait_sums[i][0]},
+        }
+        for i, name in enumerate(names)
+    }
+
+    # Ensure probabilities sum to 1
+    normalize(probabilities)
+    return probabilities
+
+
 def load_data(filename):
     """
     Load gene and trait data from a file into a dictionary.
@@ -128,6 +164,19 @@ def powerset(s):
     ]
 
 
+def subsets(mask):
+    """
+    Yield every subset of the bitmask `mask` as a bitmask, starting
+    from the empty set, without building them all first.
+    """
+    subset = 0
+    while True:
+        yield subset
+        if subset == mask:
+            return
+        subset = (subset - mask) & mask
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -138,158 +187,18 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
-    """
-
-    zero_gene = set()
-    for person in people:
-        if not person in one_gene and not person in two_genes:
-            zero_gene.add(person)
 
-    # persons with no known parents
-    no_parents = []
-    # persons with knwon parents
-    has_parents = []
-    for person in people:
-        if people[person]["mother"] == None and people[person]["father"] == None:
-            no_parents.append(person)
-        else:
-            has_parents.append(person)
-    
-    probs_zero_genes = []
-    probs_one_gene = []
-    probs_two_genes = []
-    # calculate probs for persons without known parents
-    for person in no_parents:
-        # calculate probs for persons with zero genes
-        if person in zero_gene:
-            # persons with zero genes and no trait
-            if not person in have_trait:
-                prob = PROBS["gene"][0] * PROBS["trait"][0][False]
-            # person with zero genes and has trait
-            else:
-                prob = PROBS["gene"][0] * PROBS["trait"][0][True]
-            
-            probs_zero_genes.append(prob)
-
-        # calculate probs for persons with one gene:
-        elif person in one_gene:
-            # person with one gene and no trait
-            if not person in have_trait:
-                prob = PROBS["gene"][1] * PROBS["trait"][1][False]
-            # person with one gene and has trait
-            else:
-                prob = PROBS["gene"][1] * PROBS["trait"][1][True]
-        
-            probs_one_gene.append(prob)
-        
-        # calculate probs for persons with two genes
-        else:
-            # person with two genes and no trait
-            if not person in have_trait:
-                prob = PROBS["gene"][2] * PROBS["trait"][2][False]
-            # person with two genes and has trait
-            else:
-                prob = PROBS["gene"][2] * PROBS["trait"][2][True]
-
-            probs_two_genes.append(prob)
-
-    #probs_genes_noParents = sum(probs_zero_genes) + sum(probs_one_gene) + sum(probs_two_genes)
-    probs_genes_noParents = probs_zero_genes + probs_one_gene + probs_two_genes
-    # print(probs_genes_noParents)
-
-    # calculate probs for persons with parents
-    probs_parents = [1-PROBS["mutation"], 0.5, PROBS["mutation"]] # 0.99, 0.5, 0.01
-
-    probs_genes_hasParents = []
-
-    for person in has_parents:
+    The family is compiled to a `Pedigree` on every call; loops over many
+    assignments compile it once and call `Pedigree.probability` instead.
+    """
 
-        if people[person]["mother"] in zero_gene:
-            mother = 0
-        elif people[person]["mother"] in one_gene:
-            mother = 1
-        else:
-            mother = 2
-        
-        if people[person]["father"] in zero_gene:
-            father = 0
-        elif people[person]["father"] in one_gene:
-            father = 1
-        else:
-            father = 2
-        
-        # person with no gene
-        if person in zero_gene:
-
-            child = 0
-
-            prob_gene = probs_parents[mother] * probs_parents[father]
-
-            """
-            ### both parents do not have the gene
-            if people[person]["mother"] in zero_gene and people[person]["father"] in zero_gene:
-                prob_gene = (probs_parents[0])**2
-            # father has one gene, mother none OR mother has one gene, father none
-            elif people[person]["mother"] in zero_gene and people[person]["father"] in one_gene:
-                prob_gene = (1 - PROBS["mutation"]) * 0.5
-            # father has two genes, mother none
-            elif people[person]["mother"] in zero_gene and people[person]["father"] in two_genes:
-                prob_gene = (1 - PROBS["mutation"]) * PROBS["mutation"]
-            ### father has one gene, mother one
-            elif people[person]["mother"] in one_gene and people[person]["father"] in one_gene:
-                prob_gene = 0.5 * 0.5
-            # father has two genes, mother one
-            elif people[person]["mother"] in one_gene and people[person]["father"] in two_genes:
-                prob_gene = 0.5 * PROBS["mutation"]
-            ### both have two genes
-            else:
-                prob_gene = (PROBS["mutation"])**2
-            """
-        
-        # person with one gene
-        elif person in one_gene:    # 0: 0.99; 1: 0.5; 2: 0.01
-            child = 1
-            
-            if mother == 0 and father == 0:
-                prob_gene = probs_parents[2] * probs_parents[0] + probs_parents[0] * probs_parents[2]
-            elif (mother == 0 and father == 1) or (father == 0 and mother == 1):
-                prob_gene = probs_parents[2] * probs_parents[1] + probs_parents[1] * probs_parents[0]
-            elif mother == 0 and father == 2 or (father == 0 and mother == 2):
-                prob_gene = probs_parents[2] * probs_parents[2] + probs_parents[0] * probs_parents[0]
-            elif mother == 1 and father == 1:
-                prob_gene = probs_parents[1] * probs_parents[1] + probs_parents[1] * probs_parents[1]
-            elif (mother == 1 and father == 2) or (mother == 2 and father == 1):
-                prob_gene = probs_parents[1] * probs_parents[2] + probs_parents[1] * probs_parents[0]
-            else: # if mother == 2 and father == 2:
-                prob_gene = probs_parents[0] * probs_parents[2] + probs_parents[2] * probs_parents[0]
-        
-        # person with two genes
-        else:
-            child = 2
-            
-            prob_gene = probs_parents[-(1+mother)] * probs_parents[-(1+father)]
-
-        
-        # person with no trait
-        if not person in have_trait:
-            prob = prob_gene * PROBS["trait"][child][False]
-        else:
-            prob = prob_gene * PROBS["trait"][child][True]
-            
-        probs_genes_hasParents.append(prob)
-
-    # print(f"probs_genes_hasParents: {probs_genes_hasParents}")
-    probs_genes_all = probs_genes_noParents + probs_genes_hasParents
-    # print(probs_genes_all)
-
-    #joint_probs = probs_genes_noParents + sum(probs_genes_hasParents)
-    # print(joint_probs)
-
-    joint_probs = 1
-    for prob in probs_genes_all:
-        joint_probs *= prob
-    
-    return joint_probs
+    pedigree = Pedigree.from_people(people, PROBS)
+    genes = [
+        1 if person in one_gene else 2 if person in two_genes else 0
+        for person in pedigree.names
+    ]
+    traits = [person in have_trait for person in pedigree.names]
+    return pedigree.probability(genes, traits)
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -0,0 +1,65 @@
+"""
+Pedigree compiled into integer arrays and probability tables.
+
+People are numbered in the order of the data, and every person's
+parents are stored as indices (-1 for people without parents). The
+probability of a person's gene count and trait is then a single lookup
+in a table that combines P(gene | mother, father) or P(gene) with
+P(trait | gene), so a joint probability is one lookup and one
+multiplication per person.
+"""
+
+from inference import GENES, inheritance
+
+
+class Pedigree():
+    """
+    A family in table form.
+
+    mother[i] and father[i] are the indices of person i's parents, or -1
+    for both if they are unknown. founder_table[2 * g + t] is
+    P(g copies) * P(trait t | g copies), and
+    child_table[18 * m + 6 * f + 2 * g + t] is
+    P(g copies | mother m, father f) * P(trait t | g copies).
+    """
+
+    def __init__(self, names, mother, father, probs):
+        self.names = names
+        self.mother = mother
+        self.father = father
+        # people without and with parents, split up front so that
+        # `probability` needs no branch per person
+        self.founders = [i for i, m in enumerate(mother) if m < 0]
+        self.children = [(i, m, f) for i, (m, f) in enumerate(zip(mother, father)) if m >= 0]
+        self.founder_table = [
+            probs["gene"][g] * probs["trait"][g][t] for g in GENES for t in (False, True)
+        ]
+        table = inheritance(probs)
+        self.child_table = [
+            table[m][f][g] * probs["trait"][g][t]
+            for m in GENES for f in GENES for g in GENES for t in (False, True)
+        ]
+
+    @classmethod
+    def from_people(cls, people, probs):
+        names = list(people)
+        index = {name: i for i, name in enumerate(names)}
+        mother = [index.get(people[name]["mother"], -1) for name in names]
+        father = [index.get(people[name]["father"], -1) for name in names]
+        return cls(names, mother, father, probs)
+
+    def __len__(self):
+        return len(self.names)
+
+    def probability(self, genes, traits):
+        """
+        Returns the joint probability that person i has genes[i] copies
+        of the gene and traits[i] (0 or 1) for every person i.
+        """
+        founder_table, child_table = self.founder_table, self.child_table
+        p = 1
+        for i in self.founders:
+            p *= founder_table[2 * genes[i] + traits[i]]
+        for i, m, f in self.children:
+            p *= child_table[18 * genes[m] + 6 * genes[f] + 2 * genes[i] + traits[i]]
+        return p
@@ -0,0 +1,230 @@
+"""
+Brute-force enumeration of heredity assignments in NumPy blocks.
+
+An assignment gives every person a gene count and, if their trait is
+unknown, a trait: a mixed-radix number with one digit per person, of
+radix 3 for a known trait and 6 for an unknown one. The people are
+split into outer ones, whose digits are fixed within a block, and inner
+ones, whose digits run through all their values in every block. The
+inner digits are decoded once into integer arrays, so each block is
+just table lookups from `pedigree.Pedigree`, a product down the people
+and axis sums over the block into the marginals. Factors that only
+involve inner people are the same in every block and computed once.
+Only one block of probabilities is in memory at a time.
+
+The blocks are independent, so with several workers the range of outer
+assignments is cut into chunks that run in a process pool. Each chunk
+gives unnormalized marginal sums, and the parent adds them up before
+normalizing.
+"""
+
+import itertools
+import multiprocessing
+
+import numpy as np
+
+from pedigree import Pedigree
+
+BLOCK_SIZE = 1 << 16
+# Chunks of outer assignments per worker, so uneven chunks even out
+CHUNKS_PER_WORKER = 4
+
+# (people, pedigree, block size), set in the parent before the pool
+# forks so workers share the family
+family = None
+
+
+def radices(people, names):
+    """
+    Returns the number of values of every person's digit: 3 gene counts,
+    times 2 traits if the trait is unknown.
+    """
+    return [3 if people[name]["trait"] is not None else 6 for name in names]
+
+
+def digits(people, names, value):
+    """
+    Returns (genes, traits) for one digit `value` of every person.
+    """
+    genes = []
+    traits = []
+    for name, v in zip(names, value):
+        trait = people[name]["trait"]
+        if trait is None:
+            genes.append(v // 2)
+            traits.append(v % 2)
+        else:
+            genes.append(v)
+            traits.append(int(trait))
+    return genes, traits
+
+
+def split(sizes, block_size):
+    """
+    Returns how many trailing people are inner, so that a block holds at
+    most `block_size` assignments (but always at least one person).
+    """
+    inner = 1
+    total = sizes[-1]
+    while inner < len(sizes) and total * sizes[-inner - 1] <= block_size:
+        total *= sizes[-inner - 1]
+        inner += 1
+    return inner
+
+
+def blocks(people, pedigree, block_size=BLOCK_SIZE, outer_range=None):
+    """
+    Yields (genes, traits, probabilities) for every block of assignments
+    that agrees with the known traits. genes and traits have one entry
+    per person, an int for outer people and an int8 array for inner ones.
+
+    `outer_range` restricts the enumeration to the outer assignments with
+    these indices (by default all), so the work can be split up.
+    """
+    names = pedigree.names
+    sizes = radices(people, names)
+    if not sizes:
+        return
+    inner = split(sizes, block_size)
+    first_inner = len(sizes) - inner
+
+    # every combination of the inner digits, decoded once
+    grid = np.indices(sizes[first_inner:], dtype=np.int8).reshape(inner, -1)
+    inner_genes = []
+    inner_traits = []
+    for name, column in zip(names[first_inner:], grid):
+        if people[name]["trait"] is None:
+            inner_genes.append(column // 2)
+            inner_traits.append(column % 2)
+        else:
+            inner_genes.append(column)
+            inner_traits.append(int(people[name]["trait"]))
+
+    founder_table = np.array(pedigree.founder_table)
+    child_table = np.array(pedigree.child_table)
+
+    def factor(i, genes, traits):
+        m, f = pedigree.mother[i], pedigree.father[i]
+        if m < 0:
+            return founder_table[2 * genes[i] + traits[i]]
+        return child_table[18 * genes[m] + 6 * genes[f] + 2 * genes[i] + traits[i]]
+
+    # factors of inner people only are the same in every block
+    fixed = np.ones(grid.shape[1])
+    varying = []
+    for i in range(len(names)):
+        scope = (i,) if pedigree.mother[i] < 0 else (i, pedigree.mother[i], pedigree.father[i])
+        if min(scope) >= first_inner:
+            genes = [0] * first_inner + inner_genes
+            traits = [0] * first_inner + inner_traits
+            fixed *= factor(i, genes, traits)
+        else:
+            varying.append(i)
+
+    outer = itertools.product(*(range(size) for size in sizes[:first_inner]))
+    if outer_range is not None:
+        outer = itertools.islice(outer, outer_range.start, outer_range.stop)
+
+    for value in outer:
+        genes, traits = digits(people, names[:first_inner], value)
+        genes += inner_genes
+        traits += inner_traits
+        p = fixed
+        for i in varying:
+            p = p * factor(i, genes, traits)
+        yield genes, traits, p
+
+
+def outer_count(people, block_size=BLOCK_SIZE):
+    """
+    Returns the number of blocks `blocks` yields for `people`.
+    """
+    sizes = radices(people, list(people))
+    return int(np.prod(sizes[:len(sizes) - split(sizes, block_size)])) if sizes else 0
+
+
+def accumulate(people, pedigree, block_size=BLOCK_SIZE, outer_range=None):
+    """
+    Returns the unnormalized (gene, trait) marginals of every person as
+    arrays of shape (N, 3) and (N, 2), summed over the blocks.
+    """
+    n = len(pedigree)
+    sizes = radices(people, pedigree.names)
+    inner_sizes = sizes[len(sizes) - split(sizes, block_size):] if sizes else []
+    first_inner = n - len(inner_sizes)
+    gene = np.zeros((n, 3))
+    trait = np.zeros((n, 2))
+    for genes, traits, p in blocks(people, pedigree, block_size, outer_range):
+        total = p.sum()
+        for i in range(first_inner):
+            gene[i, genes[i]] += total
+            trait[i, traits[i]] += total
+
+        # the block is a grid over the inner digits: summing out all
+        # the other axes gives the weight of each value of one digit
+        grid = p.reshape(inner_sizes)
+        for j, size in enumerate(inner_sizes):
+            i = first_inner + j
+            weights = grid.sum(axis=tuple(k for k in range(len(inner_sizes)) if k != j))
+            if size == 6:
+                weights = weights.reshape(3, 2)
+                gene[i] += weights.sum(axis=1)
+                trait[i] += weights.sum(axis=0)
+            else:
+                gene[i] += weights
+                trait[i, int(people[pedigree.names[i]]["trait"])] += total
+    return gene, trait
+
+
+def _accumulate(outer_range):
+    return accumulate(*family, outer_range)
+
+
+def partitions(count, parts):
+    """
+    Splits range(count) into at most `parts` consecutive ranges of
+    nearly equal length.
+    """
+    parts = max(min(parts, count), 1)
+    bounds = [count * k // parts for k in range(parts + 1)]
+    return [range(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if hi > lo]
+
+
+def to_probabilities(names, gene, trait):
+    """
+    Turns (N, 3) and (N, 2) marginal sums into the normalized
+    `probabilities` dictionary of `heredity.main`.
+    """
+    gene = gene / gene.sum(axis=1, keepdims=True)
+    trait = trait / trait.sum(axis=1, keepdims=True)
+    return {
+        name: {
+            "gene": {2: float(gene[i, 2]), 1: float(gene[i, 1]), 0: float(gene[i, 0])},
+            "trait": {True: float(trait[i, 1]), False: float(trait[i, 0])},
+        }
+        for i, name in enumerate(names)
+    }
+
+
+def vectorized_probabilities(people, probs, block_size=BLOCK_SIZE, workers=1):
+    """
+    Same result as `heredity.enumerate_probabilities`, enumerating the
+    assignments in NumPy blocks of up to `block_size`. With `workers` > 1
+    the blocks are shared out among that many processes.
+    """
+    global family
+    pedigree = Pedigree.from_people(people, probs)
+    family = (people, pedigree, block_size)
+    try:
+        if workers > 1 and people:
+            chunks = partitions(outer_count(people, block_size),
+                                workers * CHUNKS_PER_WORKER)
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                partial = pool.map(_accumulate, chunks, chunksize=1)
+            gene = sum(g for g, _ in partial)
+            trait = sum(t for _, t in partial)
+        else:
+            gene, trait = _accumulate(None)
+    finally:
+        family = None
+    return to_probabilities(pedigree.names, gene, trait)
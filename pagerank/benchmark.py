@@ -0,0 +1,655 @@
+"""
+Benchmarks for the pagerank project.
+
+Usage: python benchmark.py <benchmark> [options]
+Run `python benchmark.py -h` for the list of benchmarks.
+"""
+
+import argparse
+import contextlib
+import copy
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+
+import crawler
+import incremental
+import outofcore
+import pagerank
+from matrix import LinkMatrix, power_iteration
+from montecarlo import monte_carlo_pagerank
+from personalized import personalized_pagerank, teleport_matrix, write_ranks
+
+
+def synthetic_corpus(num_pages, links_per_page=5, dangling=0.05, seed=0):
+    """
+    Returns a random corpus in the format of `pagerank.crawl`.
+
+    Link targets are mostly picked by preferential attachment (pages
+    that are already linked to a lot are more likely to get new links),
+    which gives the scale-free in-degree distribution of real web
+    graphs. A fraction `dangling` of the pages has no links at all.
+    """
+    rng = random.Random(seed)
+    pages = [f"{i}.html" for i in range(num_pages)]
+    # every link target so far, so choosing from it is preferential
+    endpoints = []
+    corpus = {}
+    for i, page in enumerate(pages):
+        links = set()
+        if rng.random() >= dangling:
+            for _ in range(rng.randint(1, 2 * links_per_page - 1)):
+                if endpoints and rng.random() < 0.8:
+                    target = rng.choice(endpoints)
+                else:
+                    target = rng.choice(pages)
+                if target != page:
+                    links.add(target)
+        # sorted, as set order changes with the string hash seed
+        endpoints.extend(sorted(links))
+        corpus[page] = links
+    return corpus
+
+
+def synthetic_edges(num_pages, links_per_page=5, dangling=0.05, seed=0):
+    """
+    Vectorised version of `synthetic_corpus` for large graphs: returns
+    (sources, targets) index arrays. Targets follow a power law over a
+    random permutation of the pages.
+    """
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(1, 2 * links_per_page, size=num_pages)
+    counts[rng.random(num_pages) < dangling] = 0
+    sources = np.repeat(np.arange(num_pages), counts)
+    ranks = (rng.pareto(1.2, size=len(sources)) * num_pages / 50).astype(np.int64)
+    targets = rng.permutation(num_pages)[np.minimum(ranks, num_pages - 1)]
+    keep = sources != targets
+    return sources[keep], targets[keep]
+
+
+def synthetic_edge_chunks(num_pages, links_per_page=5, dangling=0.05, seed=0,
+                          chunk_pages=1 << 18):
+    """
+    Like `synthetic_edges`, but returns a function yielding the links in
+    chunks of `chunk_pages` source pages, for `outofcore.write_edge_file`.
+    Every call yields the same links.
+    """
+    permutation = np.random.default_rng(seed).permutation(num_pages)
+
+    def chunks():
+        for first in range(0, num_pages, chunk_pages):
+            rng = np.random.default_rng([seed, first])
+            size = min(chunk_pages, num_pages - first)
+            counts = rng.integers(1, 2 * links_per_page, size=size)
+            counts[rng.random(size) < dangling] = 0
+            sources = np.repeat(np.arange(first, first + size), counts)
+            ranks = (rng.pareto(1.2, size=len(sources)) * num_pages / 50).astype(np.int64)
+            targets = permutation[np.minimum(ranks, num_pages - 1)]
+            keep = sources != targets
+            yield sources[keep], targets[keep]
+    return chunks
+
+
+def write_corpus(directory, corpus, filler=2000):
+    """
+    Writes `corpus` as HTML files into `directory`, with about `filler`
+    bytes of text around the links of every page.
+    """
+    text = "<p>" + "lorem ipsum " * (filler // 24) + "</p>\n"
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<head><title>{page}</title></head>\n<body>\n")
+            f.write(text)
+            for link in links:
+                f.write(f'<li><a class="link" href="{link}">{link}</a></li>\n')
+            f.write(text)
+            f.write("</body>\n</html>\n")
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def quiet(function, *args, **kwargs):
+    """
+    Calls `function` with its printing sent to /dev/null.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return function(*args, **kwargs)
+
+
+def l1(a, b):
+    return sum(abs(a[page] - b[page]) for page in a)
+
+
+def legacy_sample_pagerank(corpus, damping_factor, n):
+    """
+    The original `pagerank.sample_pagerank`, which rebuilds the whole
+    transition distribution with `transition_model` at every step.
+    """
+    pages = list(corpus)
+    counts = dict.fromkeys(pages, 0)
+    current_page = random.choice(pages)
+    for _ in range(n):
+        counts[current_page] += 1
+        distribution = pagerank.transition_model(corpus, current_page, damping_factor)
+        current_page = random.choices(list(distribution), list(distribution.values()))[0]
+    return {page: count / n for page, count in counts.items()}
+
+
+def legacy_iterate_pagerank(corpus, damping_factor):
+    """
+    The original `pagerank.iterate_pagerank`, copied verbatim: it
+    prints the corpus at every step and adds links to the pages without
+    links in place.
+    """
+    print(f"Corpus: {corpus}")
+
+    list_pages = []
+    for key in corpus:
+        list_pages.append(key)
+    print(f"pages in corpus = {list_pages}")
+    
+    N = len(list_pages)
+    print(f"N (total number of pages in corpus) = {N}")
+
+    dict_pagerank = {} # PR(p)
+    for page in list_pages:
+        dict_pagerank[page] = 1 / N # start values
+
+    # check for pages with no links to other pages
+    for key in corpus:
+        if len(corpus[key]) == 0:
+            for page in list_pages:
+                corpus[key].add(page)
+    print(f"new corpus: {corpus}")
+
+    # dictionary with pages i (values) linking to page p (key)
+    dict_links = {}
+    for page in list_pages:
+        dict_links[page] = []
+
+    for page in list_pages:
+        for key in corpus:
+            if page in corpus[key]: # and not page == key:
+                dict_links[page].append(key)
+    print(f"dictionary with pages i (values) linking to page p (key): {dict_links}")
+
+    dict_residual = {} # dict mapping the change of pr_p with each iteration
+    dict_pagerank_new = {} # dict mapping the updated/new pagerank after iteration
+    condition = False
+    counter = 0
+    while condition == False:
+        for page_p in list_pages:
+            s = 0 # sum of pr_i/num_links_i
+
+            # if no page links to page_p, treat it as if every page links to it!?!
+            if len(dict_links[page_p]) == 0:
+                pr_page = 1/ N
+            else:
+                for page_i in dict_links[page_p]:
+                    pr_i = dict_pagerank[page_i]
+                    num_links_i = len(corpus[page_i])
+                    s += (pr_i / num_links_i)
+
+                pr_page = (1 - damping_factor) / N + damping_factor * s
+            
+            current_pr = dict_pagerank[page_p]
+            delta = abs(current_pr - pr_page)
+            dict_residual[page_p] = delta
+
+            dict_pagerank_new[page_p] = pr_page # store new pagerank for page p
+            print(f"count: {counter} - new page ranks: {dict_pagerank_new}")
+        
+        counter += 1
+        print(f"Counter: {counter} - residuals: {dict_residual}")
+        # check if converged
+        for key in dict_residual:
+            if dict_residual[key] <= 0.001:
+                condition = True
+            else: 
+                condition = False
+                break
+        
+        # update dict_pagerank for next iteration
+        for page in list_pages:
+            dict_pagerank[page] = dict_pagerank_new[page]
+    
+    return dict_pagerank
+
+
+def bench_sample(args):
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, seed=args.seed)
+        links = LinkMatrix.from_corpus(corpus)
+        exact = links.to_dict(power_iteration(links, pagerank.DAMPING)[0])
+        line = f"  {size:9} pages"
+
+        if size <= args.legacy_max:
+            random.seed(args.seed)
+            legacy, legacy_seconds = timed(legacy_sample_pagerank, corpus,
+                                           pagerank.DAMPING, args.legacy_samples)
+            legacy_rate = args.legacy_samples / legacy_seconds
+            line += f"  legacy {legacy_rate:12,.0f} samples/s (L1 {l1(exact, legacy):.3f})"
+        else:
+            legacy_rate = None
+            line += f"  legacy {'skipped':>12}{'':28}"
+
+        # sample_pagerank builds this table on every call, timed here alone
+        _, table_seconds = timed(pagerank.transition_table, corpus)
+        random.seed(args.seed)
+        ranks, seconds = timed(pagerank.sample_pagerank, corpus,
+                               pagerank.DAMPING, args.samples)
+        rate = args.samples / seconds
+        line += (f"  table {rate:12,.0f} samples/s (L1 {l1(exact, ranks):.3f},"
+                 f" build {table_seconds:.3f}s)")
+        if legacy_rate is not None:
+            line += f"  speedup {rate / legacy_rate:8.1f}x"
+        print(line)
+
+
+def bench_montecarlo(args):
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, seed=args.seed)
+        links = LinkMatrix.from_corpus(corpus)
+        exact, _ = power_iteration(links, pagerank.DAMPING)
+        print(f"  {size} pages")
+
+        for workers in args.workers:
+            (ranks, trace), seconds = timed(
+                monte_carlo_pagerank, links, pagerank.DAMPING, walkers=args.walkers,
+                groups=args.groups, tolerance=args.ci, workers=workers, seed=args.seed)
+            print(f"    {workers} worker(s): {trace[-1][0]:,} samples in {seconds:.2f}s "
+                  f"({trace[-1][0] / seconds:,.0f} samples/s), "
+                  f"max error {np.abs(ranks - exact).max():.2e} for CI +/- {trace[-1][1]:.2e}")
+            if args.trace:
+                for samples, width, elapsed in trace:
+                    print(f"      {samples:12,} samples  +/- {width:.2e}  {elapsed:7.2f}s")
+
+
+def bench_crawl(args):
+    for size in args.sizes:
+        directory = tempfile.mkdtemp(prefix="pagerank-")
+        try:
+            expected = synthetic_corpus(size, seed=args.seed)
+            write_corpus(directory, expected, args.filler)
+
+            corpus, seconds = timed(pagerank.crawl, directory)
+            assert corpus == expected
+            print(f"  {size:9} pages  crawl {seconds:8.3f}s")
+
+            for workers in args.workers:
+                (pages, _, targets), seconds = timed(crawler.crawl_edges, directory,
+                                                     workers=workers, use_cache=False)
+                print(f"  {'':15}  crawler, {workers} worker(s) {seconds:8.3f}s")
+
+            # first call writes the adjacency file, the second reads it
+            crawler.crawl_edges(directory)
+            (pages, _, cached), seconds = timed(crawler.crawl_edges, directory)
+            assert list(cached) == list(targets)
+            print(f"  {'':15}  adjacency file {seconds:8.3f}s "
+                  f"({os.path.getsize(crawler.adjacency_path(directory)):,} bytes)")
+        finally:
+            shutil.rmtree(directory)
+
+
+def bench_incremental(args):
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        directory = tempfile.mkdtemp(prefix="pagerank-")
+        try:
+            corpus = synthetic_corpus(size, seed=args.seed)
+            write_corpus(directory, corpus, args.filler)
+            pages = list(corpus)
+
+            stats = {}
+            _, seconds = timed(incremental.incremental_pagerank, directory,
+                               pagerank.DAMPING, stats=stats)
+            print(f"  {size:9} pages  full run {seconds:8.3f}s, "
+                  f"{stats['iterations']} iterations")
+
+            for edits in args.edits:
+                for page in rng.sample(pages, edits):
+                    write_corpus(directory, {page: set(rng.sample(pages, 5))}, args.filler)
+                    # make sure the edit is seen even on coarse mtime clocks
+                    os.utime(os.path.join(directory, page), ns=(0, time.time_ns() + 10 ** 9))
+                stats = {}
+                _, seconds = timed(incremental.incremental_pagerank, directory,
+                                   pagerank.DAMPING, stats=stats)
+                print(f"  {'':15}  {edits:5} edited pages {seconds:8.3f}s, "
+                      f"{stats['iterations']} iterations, {stats['pages crawled']} crawled, "
+                      f"+{stats['links added']}/-{stats['links removed']} links")
+        finally:
+            shutil.rmtree(directory)
+
+
+def bench_personalized(args):
+    rng = random.Random(args.seed)
+    sources, targets = synthetic_edges(args.size, seed=args.seed)
+    pages = [f"{i}.html" for i in range(args.size)]
+    links = LinkMatrix.from_edges(pages, sources, targets)
+    print(f"  {args.size} pages, {len(sources)} links")
+
+    for k in args.batches:
+        seeds = [dict.fromkeys(rng.sample(pages, args.seed_pages), 1) for _ in range(k)]
+        teleport = teleport_matrix(pages, seeds)
+
+        (ranks, iterations), batch_seconds = timed(
+            personalized_pagerank, links, pagerank.DAMPING, teleport)
+        line = (f"    k = {k:4}: batch {batch_seconds:8.3f}s ({iterations} iterations)")
+
+        if k <= args.separate_max:
+            start = time.perf_counter()
+            separate = [personalized_pagerank(links, pagerank.DAMPING, teleport[:, [j]])[0]
+                        for j in range(k)]
+            seconds = time.perf_counter() - start
+            difference = np.abs(np.hstack(separate) - ranks).sum(axis=0).max()
+            line += (f"  separate {seconds:8.3f}s  speedup {seconds / batch_seconds:5.1f}x"
+                     f"  max L1 diff {difference:.1e}")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "batch.ranks")
+            write_ranks(path, pages, [str(j) for j in range(k)], ranks)
+            line += f"  file {os.path.getsize(path) / 2**20:.1f} MiB"
+        print(line)
+
+
+def bench_outofcore(args):
+    directory = tempfile.mkdtemp(prefix="pagerank-")
+    try:
+        path = os.path.join(directory, outofcore.FILENAME)
+        for size in args.sizes:
+            chunks = synthetic_edge_chunks(size, seed=args.seed)
+            _, build_seconds = timed(outofcore.write_edge_file, path, size, chunks)
+            edges = outofcore.EdgeFile(path)
+            print(f"  {size:11,} pages, {edges.num_edges:13,} links, "
+                  f"file {os.path.getsize(path) / 2**20:8.1f} MiB, build {build_seconds:.1f}s")
+
+            for block_edges in args.block_edges:
+                baseline = outofcore.resident_bytes()
+                stats = {}
+                ranks = outofcore.stream_pagerank(edges, pagerank.DAMPING,
+                                                  block_edges=block_edges, stats=stats)
+                line = (f"    blocks of {block_edges:11,} links: {stats['blocks']:5} blocks, "
+                        f"{stats['iterations']} iterations in {stats['seconds']:7.2f}s, "
+                        f"peak RSS {stats['peak rss'] / 2**20:7.1f} MiB "
+                        f"(+{(stats['peak rss'] - baseline) / 2**20:.1f} MiB)")
+                if size <= args.check_max:
+                    sources = np.repeat(np.arange(size), np.diff(edges.offsets))
+                    links = LinkMatrix.from_edges(range(size), sources, edges.targets)
+                    exact, _ = power_iteration(links, pagerank.DAMPING)
+                    line += f"  L1 diff {np.abs(ranks - exact).sum():.1e}"
+                    del sources, links
+                print(line)
+            del edges
+    finally:
+        shutil.rmtree(directory)
+
+
+def engines(corpus, args):
+    """
+    Returns a dict of engine name to a function that runs the engine on
+    `corpus` and returns (ranks in corpus order, iterations or None).
+    For montecarlo the iterations are its sampling rounds.
+    """
+    pages = list(corpus)
+    d = pagerank.DAMPING
+
+    def in_order(ranks):
+        return np.array([ranks[page] for page in pages])
+
+    def sample():
+        return in_order(pagerank.sample_pagerank(corpus, d, args.samples)), None
+
+    def legacy_iterate():
+        # the original adds links to dangling pages in place
+        return in_order(quiet(legacy_iterate_pagerank, copy.deepcopy(corpus), d)), None
+
+    def python():
+        return in_order(pagerank.python_pagerank(corpus, d)), None
+
+    def sparse():
+        return power_iteration(LinkMatrix.from_corpus(corpus), d)
+
+    def montecarlo():
+        ranks, trace = monte_carlo_pagerank(LinkMatrix.from_corpus(corpus), d,
+                                            tolerance=args.ci, seed=args.seed)
+        return ranks, len(trace)
+
+    def personalized():
+        teleport = np.full((len(pages), 1), 1 / len(pages))
+        ranks, iterations = personalized_pagerank(LinkMatrix.from_corpus(corpus), d, teleport)
+        return ranks[:, 0], iterations
+
+    def streaming():
+        matrix = LinkMatrix.from_corpus(corpus).matrix.tocsc()
+        sources = np.repeat(np.arange(len(pages)), np.diff(matrix.indptr))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, outofcore.FILENAME)
+            outofcore.write_edge_file(path, len(pages),
+                                      lambda: [(sources, matrix.indices.astype(np.int64))])
+            stats = {}
+            edges = outofcore.EdgeFile(path)
+            ranks = outofcore.stream_pagerank(edges, d, stats=stats)
+            del edges
+        return ranks, stats["iterations"]
+
+    return {
+        "sample_pagerank": sample,
+        "legacy_iterate": legacy_iterate,
+        "python_pagerank": python,
+        "sparse": sparse,
+        "montecarlo": montecarlo,
+        "personalized": personalized,
+        "outofcore": streaming,
+    }
+
+
+def bench_accuracy(args):
+    results = []
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, args.links_per_page, args.dangling, seed=args.seed)
+        links = LinkMatrix.from_corpus(corpus)
+        reference, reference_iterations = power_iteration(
+            links, pagerank.DAMPING, tolerance=1e-15, max_iterations=100000)
+        print(f"  {size} pages, {links.matrix.nnz} links "
+              f"(reference: {reference_iterations} iterations)")
+
+        for name, run in engines(corpus, args).items():
+            if name not in args.engines:
+                continue
+            if name in ("sample_pagerank", "legacy_iterate") and size > args.legacy_max:
+                print(f"    {name:17} skipped")
+                continue
+
+            random.seed(args.seed)
+            (ranks, iterations), seconds = timed(run)
+            # a second run measures memory, as tracing slows it down
+            tracemalloc.start()
+            random.seed(args.seed)
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            error = np.abs(ranks - reference)
+            result = {
+                "engine": name,
+                "pages": size,
+                "links": int(links.matrix.nnz),
+                "seconds": seconds,
+                "iterations": iterations,
+                "l1": float(error.sum()),
+                "linf": float(error.max()),
+                "peak_bytes": peak,
+            }
+            results.append(result)
+            print(f"    {name:17} {seconds:9.3f}s  L1 {result['l1']:.2e}  "
+                  f"Linf {result['linf']:.2e}  iterations {str(iterations):>5}  "
+                  f"peak {peak / 2**20:8.1f} MiB")
+
+    if args.output:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "arguments": {key: value for key, value in vars(args).items() if key != "run"},
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def bench_iterate(args):
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, seed=args.seed)
+        line = f"  {size:9} pages"
+
+        if size <= args.legacy_max:
+            # the original adds links to dangling pages in place
+            legacy, legacy_seconds = timed(quiet, legacy_iterate_pagerank,
+                                           copy.deepcopy(corpus), pagerank.DAMPING)
+            line += f"  original {legacy_seconds:8.3f}s"
+        else:
+            legacy = None
+            line += f"  original {'skipped':>9}"
+
+        python, python_seconds = timed(pagerank.python_pagerank, corpus, pagerank.DAMPING)
+        line += f"  python {python_seconds:8.3f}s"
+
+        links, build_seconds = timed(LinkMatrix.from_corpus, corpus)
+        (ranks, iterations), seconds = timed(power_iteration, links, pagerank.DAMPING)
+        line += (f"  sparse {build_seconds + seconds:8.3f}s "
+                 f"(build {build_seconds:.3f}s, {iterations} iterations)")
+        sparse = links.to_dict(ranks)
+        line += f"  python vs sparse L1 {l1(python, sparse):.1e}"
+        if legacy is not None:
+            line += (f"  speedup {legacy_seconds / (build_seconds + seconds):8.1f}x"
+                     f"  original vs sparse L1 {l1(legacy, sparse):.2e}")
+        print(line)
+
+    for size in args.large:
+        sources, targets = synthetic_edges(size, seed=args.seed)
+        pages = [f"{i}.html" for i in range(size)]
+        links, build_seconds = timed(LinkMatrix.from_edges, pages, sources, targets)
+        (ranks, iterations), seconds = timed(power_iteration, links, pagerank.DAMPING)
+        print(f"  {size:9} pages, {len(sources)} links: sparse build {build_seconds:.2f}s, "
+              f"{iterations} iterations in {seconds:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    sample = subparsers.add_parser(
+        "sample", help="sampling throughput with and without transition tables")
+    sample.add_argument("--sizes", type=int, nargs="+",
+                        default=[10, 100, 1000, 10000, 100000])
+    sample.add_argument("--samples", type=int, default=1000000)
+    sample.add_argument("--legacy-samples", type=int, default=2000)
+    sample.add_argument("--legacy-max", type=int, default=10000,
+                        help="largest corpus to run the original sampler on")
+    sample.add_argument("--seed", type=int, default=0)
+    sample.set_defaults(run=bench_sample)
+
+    montecarlo = subparsers.add_parser(
+        "montecarlo", help="multi-walker sampling until the confidence intervals converge")
+    montecarlo.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    montecarlo.add_argument("--walkers", type=int, default=1000,
+                            help="walkers per group")
+    montecarlo.add_argument("--groups", type=int, default=8)
+    montecarlo.add_argument("--ci", type=float, default=2e-4,
+                            help="confidence interval half-width to stop at")
+    montecarlo.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    montecarlo.add_argument("--trace", action="store_true",
+                            help="print the convergence trace of every run")
+    montecarlo.add_argument("--seed", type=int, default=0)
+    montecarlo.set_defaults(run=bench_montecarlo)
+
+    crawl = subparsers.add_parser(
+        "crawl", help="pagerank.crawl vs the parallel crawler and its adjacency file")
+    crawl.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    crawl.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    crawl.add_argument("--filler", type=int, default=2000,
+                       help="bytes of text on every page besides the links")
+    crawl.add_argument("--seed", type=int, default=0)
+    crawl.set_defaults(run=bench_crawl)
+
+    incremental_ = subparsers.add_parser(
+        "incremental", help="full run vs incremental runs after a few edits")
+    incremental_.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    incremental_.add_argument("--edits", type=int, nargs="+", default=[1, 10, 100])
+    incremental_.add_argument("--filler", type=int, default=2000,
+                              help="bytes of text on every page besides the links")
+    incremental_.add_argument("--seed", type=int, default=0)
+    incremental_.set_defaults(run=bench_incremental)
+
+    personalized = subparsers.add_parser(
+        "personalized", help="batched personalized pagerank vs one run per seed set")
+    personalized.add_argument("--size", type=int, default=100000)
+    personalized.add_argument("--batches", type=int, nargs="+", default=[1, 8, 32, 128])
+    personalized.add_argument("--seed-pages", type=int, default=10,
+                              help="pages in every seed set")
+    personalized.add_argument("--separate-max", type=int, default=32,
+                              help="largest batch to also solve one seed set at a time")
+    personalized.add_argument("--seed", type=int, default=0)
+    personalized.set_defaults(run=bench_personalized)
+
+    outofcore_ = subparsers.add_parser(
+        "outofcore", help="streaming power iteration over an on-disk edge file")
+    outofcore_.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000, 10000000])
+    outofcore_.add_argument("--block-edges", type=int, nargs="+",
+                            default=[1 << 18, outofcore.BLOCK_EDGES])
+    outofcore_.add_argument("--check-max", type=int, default=1000000,
+                            help="largest graph to check against the in-memory engine")
+    outofcore_.add_argument("--seed", type=int, default=0)
+    outofcore_.set_defaults(run=bench_outofcore)
+
+    accuracy = subparsers.add_parser(
+        "accuracy", help="time and error of every engine against a precise reference")
+    accuracy.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    accuracy.add_argument("--links-per-page", type=int, default=5)
+    accuracy.add_argument("--dangling", type=float, default=0.05,
+                          help="fraction of pages without links")
+    accuracy.add_argument("--engines", nargs="+", default=[
+        "sample_pagerank", "legacy_iterate", "python_pagerank", "sparse", "montecarlo",
+        "personalized", "outofcore"])
+    accuracy.add_argument("--samples", type=int, default=pagerank.SAMPLES,
+                          help="samples for sample_pagerank")
+    accuracy.add_argument("--ci", type=float, default=1e-4,
+                          help="confidence interval half-width for montecarlo")
+    accuracy.add_argument("--legacy-max", type=int, default=1000,
+                          help="largest corpus to run sample_pagerank and legacy_iterate on")
+    accuracy.add_argument("--output", help="write the results to this JSON file")
+    accuracy.add_argument("--seed", type=int, default=0)
+    accuracy.set_defaults(run=bench_accuracy)
+
+    iterate = subparsers.add_parser(
+        "iterate", help="original iterate_pagerank vs the python and sparse power iterations")
+    iterate.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000, 10000])
+    iterate.add_argument("--legacy-max", type=int, default=1000,
+                         help="largest corpus to run the original iterate_pagerank on")
+    iterate.add_argument("--large", type=int, nargs="*", default=[1000000],
+                         help="edge-array-only sizes for the sparse engine")
+    iterate.add_argument("--seed", type=int, default=0)
+    iterate.set_defaults(run=bench_iterate)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Parallel link crawler with an on-disk adjacency file.
+
+Every HTML file is scanned as raw bytes with one compiled pattern. Large
+files are memory-mapped rather than read, so a worker never holds more
+than one small page in memory. Files are spread over a process pool and
+the links come back page by page, already resolved to page indices, so
+the link graph is only ever held as int32 CSR arrays. It is saved in
+the corpus directory in the format of `framing`, tagged with the name,
+mtime and size of every HTML file. Later crawls read it back, and only
+crawl the files that were added or changed since.
+"""
+
+import mmap
+import multiprocessing
+import os
+import re
+from array import array
+
+from framing import read_framed, write_header
+
+MAGIC = b"PRADJ003"
+FILENAME = "pagerank.adjacency"
+
+# Same links as pagerank.crawl finds, matched on the raw bytes
+LINK = re.compile(rb'<a\s+[^>]*?href="([^"]*)"')
+
+# Files up to this size are read in one go; mapping them costs more
+MMAP_THRESHOLD = 1 << 20
+
+
+def adjacency_path(directory):
+    return os.path.join(directory, FILENAME)
+
+
+def directory_key(directory):
+    """
+    Returns the sorted (filename, mtime, size) triples of the HTML files
+    in `directory` that an adjacency file depends on.
+    """
+    key = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                stat = entry.stat()
+                key.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    key.sort()
+    return key
+
+
+def extract_links(path):
+    """
+    Returns the set of href targets of the <a> tags in the file at `path`.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= MMAP_THRESHOLD:
+            links = set(LINK.findall(f.read()))
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+                links = set(LINK.findall(contents))
+    return {os.fsdecode(link) for link in links}
+
+
+# Page name to index, set before the pool forks so workers can resolve
+# the links of a page before sending them back
+index = None
+
+
+def _extract(task):
+    directory, filename = task
+    return resolve(extract_links(os.path.join(directory, filename)), index[filename])
+
+
+def resolve(links, i):
+    """
+    Splits the links of page `i` into the sorted array of indices of the
+    other pages in the corpus it links to, and the sorted list of links
+    leading outside the corpus.
+    """
+    targets = array("i", sorted(
+        index[link] for link in links if link in index and index[link] != i
+    ))
+    return targets, sorted(link for link in links if link not in index)
+
+
+def crawl_pages(directory, pages, names, workers=1):
+    """
+    Crawls the pages `names` of `directory`, whose corpus has the sorted
+    page names `pages`, and yields (targets, outside) as `resolve`
+    returns them, one page at a time in the order of `names`.
+    """
+    global index
+    index = {page: i for i, page in enumerate(pages)}
+    return _crawl(((directory, name) for name in names), workers)
+
+
+def _crawl(tasks, workers):
+    if workers > 1:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            yield from pool.imap(_extract, tasks, chunksize=64)
+    else:
+        yield from map(_extract, tasks)
+
+
+def crawl_edges(directory, workers=1, use_cache=True, stats=None, path=None):
+    """
+    Crawls `directory` and returns (pages, offsets, targets): the sorted
+    page names and the links as CSR arrays, where page i links to pages
+    targets[offsets[i]:offsets[i + 1]]. Only links to other pages in the
+    corpus are kept.
+
+    With `use_cache`, the adjacency file at `path` (by default the one
+    in `directory`) is used if it matches the HTML files, and written
+    otherwise. If only some files changed, just those are crawled again
+    and the links of the others are taken from the adjacency file.
+
+    If `stats` is a dict, the number of pages reused, crawled and
+    removed, and of links added and removed since the adjacency file was
+    written, are stored in it.
+    """
+    key = directory_key(directory)
+    if path is None:
+        path = adjacency_path(directory)
+    previous = read_adjacency(path) if use_cache else None
+    if previous is not None and previous["key"] == key:
+        if stats is not None:
+            stats.update({"pages reused": len(key), "pages crawled": 0, "pages removed": 0,
+                          "links added": 0, "links removed": 0})
+        return previous["pages"], previous["offsets"], previous["targets"]
+
+    pages = [filename for filename, _, _ in key]
+
+    # pages whose file is unchanged since the adjacency file was written
+    reused = {}
+    if previous is not None:
+        old_files = {entry[0]: k for k, entry in enumerate(previous["key"])}
+        for i, entry in enumerate(key):
+            k = old_files.get(entry[0])
+            if k is not None and previous["key"][k] == entry:
+                reused[i] = k
+
+    # with the same set of pages, the rows of unchanged pages are copied
+    # as they are; otherwise their links are resolved again, including
+    # those that led outside the old corpus but may reach an added page
+    same_pages = previous is not None and previous["pages"] == pages
+    changed = (page for i, page in enumerate(pages) if i not in reused)
+    crawled = crawl_pages(directory, pages, changed, workers)
+    offsets = array("i", [0])
+    targets = array("i")
+    external = {}
+    for i, page in enumerate(pages):
+        k = reused.get(i)
+        if k is None:
+            row, outside = next(crawled)
+        elif same_pages:
+            row = previous["targets"][previous["offsets"][k]:previous["offsets"][k + 1]]
+            outside = previous["external"].get(page)
+        else:
+            row, outside = resolve(_links(previous, k), i)
+        targets.extend(row)
+        if outside:
+            external[page] = outside
+        offsets.append(len(targets))
+    crawled.close()
+
+    if stats is not None:
+        stats.update(_diff(previous, pages, offsets, targets, reused if same_pages else ()))
+        stats["pages reused"] = len(reused)
+        stats["pages crawled"] = len(pages) - len(reused)
+    if use_cache:
+        write_adjacency(path, key, pages, offsets, targets, external)
+    return pages, offsets, targets
+
+
+def _links(previous, k):
+    """
+    Returns every link of page `k` in the `previous` adjacency file.
+    """
+    pages, offsets = previous["pages"], previous["offsets"]
+    links = {pages[j] for j in previous["targets"][offsets[k]:offsets[k + 1]]}
+    links.update(previous["external"].get(pages[k], ()))
+    return links
+
+
+def _diff(previous, pages, offsets, targets, unchanged=()):
+    """
+    Counts the pages removed and the links added and removed between the
+    `previous` adjacency file (or an empty corpus) and the new graph.
+    Pages whose indices are in `unchanged` are known to have the same
+    links in both.
+    """
+    old_pages = previous["pages"] if previous is not None else []
+    old_index = {page: i for i, page in enumerate(old_pages)}
+    new_pages = set(pages)
+    added = removed = 0
+    for i, page in enumerate(pages):
+        if i in unchanged:
+            continue
+        new = {pages[j] for j in targets[offsets[i]:offsets[i + 1]]}
+        k = old_index.get(page)
+        if k is None:
+            added += len(new)
+            continue
+        start, end = previous["offsets"][k], previous["offsets"][k + 1]
+        old = {old_pages[j] for j in previous["targets"][start:end]}
+        added += len(new - old)
+        removed += len(old - new)
+    gone = [k for page, k in old_index.items() if page not in new_pages]
+    for k in gone:
+        removed += previous["offsets"][k + 1] - previous["offsets"][k]
+    return {"pages removed": len(gone), "links added": added, "links removed": removed}
+
+
+def crawl(directory, workers=1, use_cache=True):
+    """
+    Same result as `pagerank.crawl`: a dict of page name to the set of
+    other pages in the corpus it links to.
+    """
+    return to_corpus(*crawl_edges(directory, workers, use_cache))
+
+
+def to_corpus(pages, offsets, targets):
+    """
+    Turns the CSR arrays of `crawl_edges` into a dict of page name to
+    the set of pages it links to.
+    """
+    return {
+        page: {pages[j] for j in targets[offsets[i]:offsets[i + 1]]}
+        for i, page in enumerate(pages)
+    }
+
+
+def write_adjacency(path, key, pages, offsets, targets, external):
+    """
+    Writes the link graph to `path`, tagged with `key`. `external` maps
+    pages to their links that lead outside the corpus.
+
+    The file is written next to `path` first and then moved into place,
+    so a reader never sees a half written file.
+    """
+    header = {"key": key, "pages": pages, "links": len(targets), "external": external}
+    tmp = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            write_header(f, MAGIC, header)
+            f.write(offsets.tobytes())
+            f.write(targets.tobytes())
+        os.replace(tmp, path)
+    except OSError:
+        # a read-only corpus is crawled every time
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_adjacency(path):
+    """
+    Memory-maps the adjacency file at `path`.
+
+    Returns its header, a dict with the "key" of HTML files it was built
+    from, the "pages" and their "external" links, and the "offsets" and
+    "targets" arrays as int32 memoryviews. Returns None if there is no
+    readable adjacency file.
+    """
+    try:
+        header, mapping, start = read_framed(path, MAGIC)
+        # JSON turns the (filename, mtime, size) triples into lists
+        header["key"] = [tuple(entry) for entry in header["key"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    end = start + 4 * (len(header["pages"]) + 1)
+    view = memoryview(mapping)
+    header["offsets"] = view[start:end].cast("i")
+    header["targets"] = view[end:end + 4 * header["links"]].cast("i")
+    return header
+
@@ -0,0 +1,55 @@
+"""
+Framing of the binary files of the pagerank project.
+
+A file starts with 8 magic bytes and the length of a JSON header,
+followed by the header and, from the next multiple of 8 bytes on, raw
+arrays whose layout the header describes. The header is JSON rather
+than pickle, so a file found in a corpus directory cannot run code when
+it is read. Files are memory-mapped for reading, so the arrays are used
+in place without being copied.
+"""
+
+import json
+import mmap
+import struct
+
+# magic, header length
+PREFIX = struct.Struct("<8sQ")
+ALIGNMENT = 8
+
+
+def write_header(f, magic, header):
+    """
+    Writes `magic` and the JSON `header` at the start of the open file
+    `f`, and returns the offset where the arrays start. The file
+    position is left at that offset.
+    """
+    data = json.dumps(header).encode()
+    f.write(PREFIX.pack(magic, len(data)))
+    f.write(data)
+    start = align(PREFIX.size + len(data))
+    f.seek(start)
+    return start
+
+
+def read_framed(path, magic):
+    """
+    Memory-maps the file at `path` and returns (header, mapping, start):
+    its JSON header, a read-only map of the whole file and the offset
+    where the arrays start.
+
+    Raises ValueError if it is not a file starting with `magic`, and
+    OSError if it cannot be read.
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(PREFIX.size)
+        if len(prefix) != PREFIX.size or prefix[:len(magic)] != magic:
+            raise ValueError(f"{path} is not a {magic.decode()} file")
+        _, header_length = PREFIX.unpack(prefix)
+        header = json.loads(f.read(header_length))
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return header, mapping, align(PREFIX.size + header_length)
+
+
+def align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,100 @@
+"""
+Incremental PageRank for a corpus that changes a few pages at a time.
+
+The link graph comes from `crawler.crawl_edges`, which only crawls the
+HTML files that changed since its adjacency file was written. The ranks
+of every run are saved next to it, and the next run starts the power
+iteration from them instead of from 1/N: after a small edit most pages
+keep almost the same rank, so it converges in a few iterations. The
+ranks file is in the format of `framing`.
+"""
+
+import os
+
+import numpy as np
+
+import crawler
+from framing import read_framed, write_header
+from matrix import TOLERANCE, LinkMatrix, power_iteration
+
+MAGIC = b"PRRANK01"
+FILENAME = "pagerank.ranks"
+
+
+def ranks_path(directory):
+    return os.path.join(directory, FILENAME)
+
+
+def load_ranks(path):
+    """
+    Returns the dict of page name to rank saved at `path`, or None if
+    there is no readable ranks file.
+    """
+    try:
+        header, mapping, start = read_framed(path, MAGIC)
+        pages = header["pages"]
+        ranks = np.frombuffer(mapping, dtype=np.float64, count=len(pages), offset=start)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return dict(zip(pages, ranks.tolist()))
+
+
+def save_ranks(path, pages, ranks):
+    tmp = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            write_header(f, MAGIC, {"pages": pages})
+            f.write(np.asarray(ranks, dtype=np.float64).tobytes())
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def warm_start(pages, previous):
+    """
+    Returns a start vector for `pages` from the `previous` ranks: pages
+    seen before keep their rank, new pages get 1/N, and the vector is
+    scaled back to sum to 1.
+    """
+    n = len(pages)
+    start = np.array([previous.get(page, 1 / n) for page in pages])
+    return start / start.sum()
+
+
+def incremental_pagerank(directory, damping_factor, tolerance=TOLERANCE, workers=1,
+                         stats=None):
+    """
+    Returns a dict of page name to PageRank value for the corpus in
+    `directory`, reusing the adjacency and ranks files of earlier runs.
+
+    If `stats` is a dict, the crawl statistics of `crawler.crawl_edges`
+    are stored in it, along with the number of power iterations and
+    whether they were warm-started.
+    """
+    if stats is None:
+        stats = {}
+    pages, offsets, targets = crawler.crawl_edges(directory, workers, stats=stats)
+    links = LinkMatrix.from_adjacency(pages, offsets, targets)
+    return warm_pagerank(directory, links, damping_factor, tolerance, stats)
+
+
+def warm_pagerank(directory, links, damping_factor, tolerance=TOLERANCE, stats=None):
+    """
+    Returns a dict of page name to PageRank value for the `LinkMatrix`
+    of the corpus in `directory`, starting from the ranks saved there by
+    the last run, and saves the new ranks for the next one.
+
+    If `stats` is a dict, the number of power iterations and whether
+    they were warm-started are stored in it.
+    """
+    path = ranks_path(directory)
+    previous = load_ranks(path)
+    start = warm_start(links.pages, previous) if previous and len(links) else None
+    ranks, iterations = power_iteration(links, damping_factor, tolerance, start=start)
+    save_ranks(path, links.pages, ranks)
+
+    if stats is not None:
+        stats["iterations"] = iterations
+        stats["warm start"] = start is not None
+    return links.to_dict(ranks)
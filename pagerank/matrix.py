@@ -0,0 +1,106 @@
+"""
+Sparse-matrix PageRank.
+
+The corpus is turned into a SciPy CSR matrix with one column per linking
+page, and PageRank is computed by power iteration on NumPy vectors.
+Pages without links are treated as linking to every page, as in
+`pagerank.python_pagerank`, without materialising those links.
+"""
+
+import numpy as np
+import scipy.sparse
+
+from pagerank import MAX_ITERATIONS, TOLERANCE
+
+
+class LinkMatrix():
+    """
+    Column-stochastic link matrix of a corpus.
+
+    matrix[j, i] is 1 / (number of links on page i) if page i links to
+    page j. `dangling` marks the pages without any links.
+    """
+
+    def __init__(self, pages, matrix, dangling):
+        self.pages = pages
+        self.matrix = matrix
+        self.dangling = dangling
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        pages = list(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+
+        sources = []
+        targets = []
+        for i, page in enumerate(pages):
+            for link in corpus[page]:
+                j = index.get(link)
+                if j is not None and j != i:
+                    sources.append(i)
+                    targets.append(j)
+        return cls.from_edges(pages, np.array(sources, dtype=np.int64),
+                              np.array(targets, dtype=np.int64))
+
+    @classmethod
+    def from_edges(cls, pages, sources, targets):
+        """
+        Builds the matrix from parallel arrays of (source, target) page
+        indices, one per link.
+        """
+        n = len(pages)
+        out_degree = np.bincount(sources, minlength=n)
+        weights = 1.0 / out_degree[sources]
+        matrix = scipy.sparse.csr_matrix((weights, (targets, sources)), shape=(n, n))
+        return cls(pages, matrix, out_degree == 0)
+
+    @classmethod
+    def from_adjacency(cls, pages, offsets, targets):
+        """
+        Builds the matrix from the CSR arrays of `crawler.crawl_edges`.
+        """
+        offsets = np.frombuffer(offsets, dtype=np.int32)
+        targets = np.frombuffer(targets, dtype=np.int32).astype(np.int64)
+        sources = np.repeat(np.arange(len(pages)), np.diff(offsets))
+        return cls.from_edges(pages, sources, targets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def to_dict(self, ranks):
+        return {page: float(rank) for page, rank in zip(self.pages, ranks)}
+
+
+def power_iteration(links, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, start=None):
+    """
+    Iterates PR = (1 - d) / N + d * (M @ PR + dangling mass / N) until
+    the L1 norm of the change drops below `tolerance`.
+
+    `start` is the initial rank vector (uniform by default).
+    Returns (ranks, iterations).
+    """
+    n = len(links)
+    ranks = np.full(n, 1 / n) if start is None else np.asarray(start, dtype=float)
+    teleport = (1 - damping_factor) / n
+
+    for iteration in range(1, max_iterations + 1):
+        dangling_mass = ranks[links.dangling].sum()
+        new_ranks = damping_factor * (links.matrix @ ranks + dangling_mass / n) + teleport
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+
+    # keep the ranks a probability distribution despite rounding
+    return ranks / ranks.sum(), iteration
+
+
+def sparse_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
+    """
+    Same result format as `pagerank.iterate_pagerank`: a dict of page
+    name to PageRank value, summing to 1.
+    """
+    links = LinkMatrix.from_corpus(corpus)
+    ranks, _ = power_iteration(links, damping_factor, tolerance)
+    return links.to_dict(ranks)
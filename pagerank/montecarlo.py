@@ -0,0 +1,136 @@
+"""
+Monte Carlo PageRank with many random surfers at once.
+
+The surfers are split into independent groups. Every group moves all of
+its walkers one step at a time with NumPy, counting the pages they
+visit, and groups can run in a process pool. The spread of the group
+estimates gives a confidence interval on each rank, and sampling stops
+once the widest interval is narrower than the requested tolerance.
+"""
+
+import multiprocessing
+import time
+
+import numpy as np
+
+from matrix import LinkMatrix
+
+# Largest confidence interval half-width to stop at
+TOLERANCE = 1e-3
+# 95% two-sided normal quantile
+Z = 1.96
+MAX_SAMPLES = 10 ** 9
+
+# Set in the parent before the pool forks, so workers share the arrays
+offsets = None
+targets = None
+damping = None
+
+
+def walk(positions, steps, seed):
+    """
+    Moves every walker in `positions` `steps` times and returns
+    (visit counts, new positions).
+
+    With probability `damping` a walker follows a random link of its
+    page, otherwise (and always on a page without links) it jumps to a
+    random page.
+    """
+    n = len(offsets) - 1
+    rng = np.random.default_rng(seed)
+    out_degree = np.diff(offsets)
+    counts = np.zeros(n, dtype=np.int64)
+
+    for _ in range(steps):
+        counts += np.bincount(positions, minlength=n)
+        degree = out_degree[positions]
+        follow = np.flatnonzero((degree > 0) & (rng.random(len(positions)) < damping))
+        moved = rng.integers(n, size=len(positions))
+        here = positions[follow]
+        choice = (rng.random(len(follow)) * degree[follow]).astype(np.int64)
+        moved[follow] = targets[offsets[here] + choice]
+        positions = moved
+    return counts, positions
+
+
+def _walk(task):
+    group, positions, steps, seed = task
+    counts, positions = walk(positions, steps, seed)
+    return group, counts, positions
+
+
+def monte_carlo_pagerank(links, damping_factor, walkers=1000, groups=8, steps=100,
+                         tolerance=TOLERANCE, max_samples=MAX_SAMPLES, burn_in=50,
+                         workers=1, seed=None):
+    """
+    Estimates PageRank for a `matrix.LinkMatrix` by running `walkers`
+    random surfers in each of `groups` independent groups.
+
+    Every round moves all walkers `steps` times. After each round the
+    rank of each page is estimated per group, and the 95% confidence
+    interval is Z * (standard deviation across groups) / sqrt(groups).
+    Walking stops when the widest half-width is below `tolerance` or
+    `max_samples` visits have been counted. The first `burn_in` steps of
+    every walker are not counted, so the uniform start does not bias the
+    estimate. With `workers` > 1 the groups run in a process pool.
+
+    Returns (ranks, trace), where trace is a list of
+    (samples, widest half-width, seconds) tuples, one per round.
+    """
+    global offsets, targets, damping
+    if groups < 2:
+        raise ValueError("at least 2 groups are needed for a confidence interval")
+
+    by_source = links.matrix.tocsc()
+    offsets = by_source.indptr.astype(np.int64)
+    targets = by_source.indices.astype(np.int64)
+    damping = damping_factor
+    n = len(links)
+
+    seeds = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(seeds.spawn(1)[0])
+    positions = [rng.integers(n, size=walkers) for _ in range(groups)]
+    counts = np.zeros((groups, n), dtype=np.int64)
+    trace = []
+    start = time.perf_counter()
+
+    pool = multiprocessing.get_context("fork").Pool(workers) if workers > 1 else None
+    try:
+        run = pool.imap_unordered if pool is not None else map
+
+        if burn_in:
+            tasks = [(g, positions[g], burn_in, s) for g, s in enumerate(seeds.spawn(groups))]
+            for g, _, moved in run(_walk, tasks):
+                positions[g] = moved
+
+        samples = 0
+        while samples < max_samples:
+            tasks = [(g, positions[g], steps, s) for g, s in enumerate(seeds.spawn(groups))]
+            for g, group_counts, moved in run(_walk, tasks):
+                counts[g] += group_counts
+                positions[g] = moved
+            samples += groups * walkers * steps
+
+            estimates = counts / counts.sum(axis=1, keepdims=True)
+            width = Z * estimates.std(axis=0, ddof=1).max() / np.sqrt(groups)
+            trace.append((samples, float(width), time.perf_counter() - start))
+            if width < tolerance:
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    total = counts.sum(axis=0)
+    return total / total.sum(), trace
+
+
+def sampled_pagerank(corpus, damping_factor, tolerance=TOLERANCE, workers=1, **options):
+    """
+    Same result format as `pagerank.sample_pagerank`, plus the
+    convergence trace: returns (dict of page name to rank, trace).
+    """
+    links = LinkMatrix.from_corpus(corpus)
+    ranks, trace = monte_carlo_pagerank(links, damping_factor, tolerance=tolerance,
+                                        workers=workers, **options)
+    return links.to_dict(ranks), trace
@@ -0,0 +1,242 @@
+"""
+Out-of-core PageRank for link graphs larger than memory.
+
+The links are stored on disk sorted by source page: an int64 offsets
+array with one entry per page and an int32 array of link targets, so
+the links of page i are targets[offsets[i]:offsets[i + 1]]. The file is
+memory-mapped, and every iteration streams over the targets in blocks,
+releasing the pages of a block once it has been used. Only a few
+vectors with one entry per page are held in memory, so the resident set
+stays bounded by those plus one block, however many links there are.
+
+Usage: python outofcore.py corpus [--edges FILE] [--block-edges N] [--top N]
+                            [--workers N]
+
+The edge file is written to FILE, or to a temporary file that is
+removed again when no FILE is given.
+"""
+
+import argparse
+import mmap
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import crawler
+from framing import read_framed, write_header
+from matrix import MAX_ITERATIONS, TOLERANCE
+from pagerank import DAMPING
+
+MAGIC = b"PREDGE02"
+FILENAME = "pagerank.edges"
+BLOCK_EDGES = 1 << 22
+
+
+class EdgeFile():
+    """
+    Memory-mapped links of a file written by `write_edge_file`.
+    """
+
+    def __init__(self, path):
+        header, self.mapping, start = read_framed(path, MAGIC)
+        self.num_pages = header["pages"]
+        self.offsets = np.frombuffer(self.mapping, dtype=np.int64,
+                                     count=self.num_pages + 1, offset=start)
+        self.num_edges = int(self.offsets[-1])
+        self.targets_start = start + 8 * (self.num_pages + 1)
+        self.targets = np.frombuffer(self.mapping, dtype=np.int32,
+                                     count=self.num_edges, offset=self.targets_start)
+
+    def __len__(self):
+        return self.num_pages
+
+    def blocks(self, block_edges=BLOCK_EDGES):
+        """
+        Returns (first page, last page + 1) ranges that split the links
+        into blocks of about `block_edges` links each. A page is never
+        split, so a page with more links gets a block of its own.
+        """
+        bounds = np.searchsorted(self.offsets, np.arange(0, self.num_edges, block_edges))
+        bounds = np.unique(np.concatenate([bounds, [self.num_pages]]))
+        bounds = bounds[bounds > 0]
+        return list(zip(np.concatenate([[0], bounds[:-1]]).tolist(), bounds.tolist()))
+
+    def release(self, lo, hi):
+        """
+        Drops the mapped pages of targets[lo:hi] from memory. They are
+        read back from the file when they are touched again.
+        """
+        start = (self.targets_start + 4 * lo) // mmap.PAGESIZE * mmap.PAGESIZE
+        end = self.targets_start + 4 * hi
+        if end > start:
+            self.mapping.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def write_edge_file(path, num_pages, chunks):
+    """
+    Writes the links produced by `chunks()` to `path`, sorted by source.
+
+    `chunks` is called twice and must return the same iterable of
+    (sources, targets) page index arrays both times, so the links never
+    have to be in memory all at once: the first pass counts the links
+    of every page, the second writes each chunk into place.
+    """
+    out_degree = np.zeros(num_pages, dtype=np.int64)
+    for sources, _ in chunks():
+        out_degree += np.bincount(sources, minlength=num_pages)
+    offsets = np.zeros(num_pages + 1, dtype=np.int64)
+    np.cumsum(out_degree, out=offsets[1:])
+    num_edges = int(offsets[-1])
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w+b") as f:
+        start = write_header(f, MAGIC, {"pages": int(num_pages)})
+        targets_start = start + 8 * (num_pages + 1)
+        f.write(offsets.tobytes())
+        f.truncate(targets_start + 4 * num_edges)
+        f.flush()
+
+        if num_edges:
+            with mmap.mmap(f.fileno(), 0) as mapping:
+                targets = np.frombuffer(mapping, dtype=np.int32, count=num_edges,
+                                        offset=targets_start)
+                cursor = offsets[:-1].copy()
+                for sources, chunk_targets in chunks():
+                    order = np.argsort(sources, kind="stable")
+                    sources = sources[order]
+                    # position of every link among the chunk's links of its page
+                    first = np.searchsorted(sources, sources)
+                    rank = np.arange(len(sources)) - first
+                    targets[cursor[sources] + rank] = chunk_targets[order]
+                    cursor += np.bincount(sources, minlength=num_pages)
+                    # written pages go to disk instead of staying resident
+                    mapping.flush()
+                    mapping.madvise(mmap.MADV_DONTNEED)
+                del targets
+    os.replace(tmp, path)
+
+
+def write_edge_rows(path, num_pages, rows):
+    """
+    Writes the links of every page to `path`, where `rows` yields the
+    array of link targets of page 0, 1, ... in order.
+
+    Every row goes to the file as it arrives, so only the offsets, with
+    one entry per page, are held in memory.
+    """
+    offsets = np.zeros(num_pages + 1, dtype=np.int64)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        start = write_header(f, MAGIC, {"pages": int(num_pages)})
+        f.seek(start + 8 * (num_pages + 1))
+        for i, row in enumerate(rows):
+            f.write(np.asarray(row, dtype=np.int32).tobytes())
+            offsets[i + 1] = offsets[i] + len(row)
+        f.seek(start)
+        f.write(offsets.tobytes())
+    os.replace(tmp, path)
+
+
+def stream_pagerank(edges, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, block_edges=BLOCK_EDGES, stats=None):
+    """
+    Power iteration over an `EdgeFile`, reading its links one block at a
+    time. Pages without links are treated as linking to every page.
+
+    Returns the rank vector. If `stats` is a dict, the number of
+    iterations and blocks, the time taken and the peak resident set
+    size in bytes while iterating are stored in it.
+    """
+    start_time = time.perf_counter()
+    n = len(edges)
+    out_degree = np.diff(edges.offsets)
+    dangling = np.flatnonzero(out_degree == 0)
+    inverse = np.zeros(n)
+    np.divide(1, out_degree, out=inverse, where=out_degree > 0)
+    blocks = edges.blocks(block_edges)
+
+    ranks = np.full(n, 1 / n)
+    teleport = (1 - damping_factor) / n
+    peak = resident_bytes()
+    for iteration in range(1, max_iterations + 1):
+        share = ranks * inverse
+        new_ranks = np.zeros(n)
+        for first, last in blocks:
+            lo, hi = int(edges.offsets[first]), int(edges.offsets[last])
+            weights = np.repeat(share[first:last], out_degree[first:last])
+            # unlike bincount, add.at needs no temporary with one entry per page
+            np.add.at(new_ranks, edges.targets[lo:hi], weights)
+            peak = max(peak, resident_bytes())
+            edges.release(lo, hi)
+
+        new_ranks += ranks[dangling].sum() / n
+        new_ranks *= damping_factor
+        new_ranks += teleport
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+
+    if stats is not None:
+        stats["iterations"] = iteration
+        stats["blocks"] = len(blocks)
+        stats["seconds"] = time.perf_counter() - start_time
+        stats["peak rss"] = peak
+    return ranks / ranks.sum()
+
+
+def resident_bytes():
+    """
+    Returns the current resident set size of this process in bytes,
+    falling back to the peak where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus")
+    parser.add_argument("--block-edges", type=int, default=BLOCK_EDGES,
+                        help="links read per block")
+    parser.add_argument("--top", type=int, default=10, help="number of pages to print")
+    parser.add_argument("--workers", type=int, default=1, help="processes for crawling")
+    parser.add_argument("--edges", metavar="FILE", help="where to write the edge file")
+    args = parser.parse_args()
+
+    if args.edges is not None:
+        path = args.edges
+    else:
+        fd, path = tempfile.mkstemp(suffix=f".{FILENAME}")
+        os.close(fd)
+    try:
+        # the links go from the crawler to the file page by page, so the
+        # link graph is never held in memory as a whole
+        pages = [filename for filename, _, _ in crawler.directory_key(args.corpus)]
+        rows = (targets for targets, _ in
+                crawler.crawl_pages(args.corpus, pages, pages, args.workers))
+        write_edge_rows(path, len(pages), rows)
+
+        stats = {}
+        ranks = stream_pagerank(EdgeFile(path), DAMPING, block_edges=args.block_edges,
+                                stats=stats)
+    finally:
+        if args.edges is None:
+            os.remove(path)
+    print(f"PageRank Results from Streaming ({stats['iterations']} iterations, "
+          f"{stats['blocks']} blocks, peak RSS {stats['peak rss'] / 2**20:.1f} MiB)")
+    for i in np.argsort(-ranks)[:args.top]:
+        print(f"  {pages[i]}: {ranks[i]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,4 @@
-###                               TO DO                         ###
-### Iteration not behaving properly, values dont sum up to one. ###
-
+import argparse
 import os
 import random
 import re
@@ -8,17 +6,65 @@ import sys
 
 DAMPING = 0.85
 SAMPLES = 10000
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 1000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    parser = argparse.ArgumentParser(
+        usage="python pagerank.py [--engine ENGINE] [--fast-crawl] [--incremental] "
+              "[--walkers N] [--workers N] [--ci W] corpus")
+    parser.add_argument("corpus")
+    parser.add_argument("--engine", choices=["python", "sparse"], default="sparse",
+                        help="iteration engine (sparse needs numpy and scipy, and "
+                             "falls back to python without them)")
+    parser.add_argument("--fast-crawl", action="store_true",
+                        help="crawl in parallel and reuse the saved link graph")
+    parser.add_argument("--incremental", action="store_true",
+                        help="like --fast-crawl, and start iterating from the saved "
+                             "ranks of the last run (needs numpy and scipy)")
+    parser.add_argument("--walkers", type=int,
+                        help="sample with this many walkers per group (needs numpy and scipy)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for crawling and for the walker groups")
+    parser.add_argument("--ci", type=float, default=1e-3,
+                        help="stop sampling once every 95%% confidence interval "
+                             "is narrower than +/- this")
+    args = parser.parse_args()
+
+    if args.incremental:
+        # crawl once: the same link graph is sampled and iterated on
+        import crawler
+        stats = {}
+        edges = crawler.crawl_edges(args.corpus, args.workers, stats=stats)
+        corpus = crawler.to_corpus(*edges)
+    elif args.fast_crawl:
+        from crawler import crawl as fast_crawl
+        corpus = fast_crawl(args.corpus, workers=args.workers)
+    else:
+        corpus = crawl(args.corpus)
+    if args.walkers:
+        from montecarlo import sampled_pagerank
+        ranks, trace = sampled_pagerank(corpus, DAMPING, tolerance=args.ci,
+                                        workers=args.workers, walkers=args.walkers)
+        for samples, width, seconds in trace:
+            print(f"  {samples} samples: +/- {width:.5f} after {seconds:.2f}s", file=sys.stderr)
+        print(f"PageRank Results from Sampling (n = {trace[-1][0]})")
+    else:
+        ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+        print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    if args.incremental:
+        from incremental import warm_pagerank
+        from matrix import LinkMatrix
+        ranks = warm_pagerank(args.corpus, LinkMatrix.from_adjacency(*edges), DAMPING,
+                              stats=stats)
+        print(", ".join(f"{name}: {value}" for name, value in stats.items()), file=sys.stderr)
+    elif args.engine == "python":
+        ranks = python_pagerank(corpus, DAMPING)
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -98,44 +144,38 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-
-    # list with all pages in the corpus
-    list_pages = []
-    for key in corpus:
-        list_pages.append(key)
-
-    dict_count_pages = {}
-    
-    for page in list_pages:
-        dict_count_pages[page] = 0
-
-    current_page = random.choice(list_pages)
-    current_n = 0
-
-    while current_n < n:
-
-        dict_count_pages[current_page] += 1
-        prob_distribution = transition_model(corpus, current_page, damping_factor)
-        
-        pages = []
-        probs = []
-        for key in prob_distribution:
-            pages.append(key)
-            probs.append(prob_distribution[key])
-
-        new_page = random.choices(pages, probs) #random choice from pages with weighting probs
-        
-        current_page = new_page[0]
-        current_n += 1
-    
-    dict_pagerank = {}
-
-    for key in dict_count_pages:
-        dict_pagerank[key] = dict_count_pages[key] / n
-
-    return dict_pagerank
-
-    # raise NotImplementedError
+    pages, links = transition_table(corpus)
+    number_pages = len(pages)
+    counts = [0] * number_pages
+
+    # The transition model is a mixture: with probability damping_factor
+    # follow one of the page's links, otherwise jump to any page (always
+    # for pages without links). Drawing from the mixture directly makes
+    # every step O(1) instead of rebuilding the distribution each time.
+    current_page = random.randrange(number_pages)
+    for _ in range(n):
+        counts[current_page] += 1
+        page_links = links[current_page]
+        if page_links and random.random() < damping_factor:
+            current_page = page_links[random.randrange(len(page_links))]
+        else:
+            current_page = random.randrange(number_pages)
+
+    return {page: counts[i] / n for i, page in enumerate(pages)}
+
+
+def transition_table(corpus):
+    """
+    Return (pages, links): the list of pages in the corpus, and for each
+    page the tuple of indices of the pages it links to.
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    links = [
+        tuple(index[link] for link in corpus[page] if link in index)
+        for page in pages
+    ]
+    return pages, links
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -146,82 +186,62 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
-    print(f"Corpus: {corpus}")
-
-    list_pages = []
-    for key in corpus:
-        list_pages.append(key)
-    print(f"pages in corpus = {list_pages}")
-    
-    N = len(list_pages)
-    print(f"N (total number of pages in corpus) = {N}")
-
-    dict_pagerank = {} # PR(p)
-    for page in list_pages:
-        dict_pagerank[page] = 1 / N # start values
 
-    # check for pages with no links to other pages
-    for key in corpus:
-        if len(corpus[key]) == 0:
-            for page in list_pages:
-                corpus[key].add(page)
-    print(f"new corpus: {corpus}")
-
-    # dictionary with pages i (values) linking to page p (key)
-    dict_links = {}
-    for page in list_pages:
-        dict_links[page] = []
-
-    for page in list_pages:
-        for key in corpus:
-            if page in corpus[key]: # and not page == key:
-                dict_links[page].append(key)
-    print(f"dictionary with pages i (values) linking to page p (key): {dict_links}")
-
-    dict_residual = {} # dict mapping the change of pr_p with each iteration
-    dict_pagerank_new = {} # dict mapping the updated/new pagerank after iteration
-    condition = False
-    counter = 0
-    while condition == False:
-        for page_p in list_pages:
-            s = 0 # sum of pr_i/num_links_i
-
-            # if no page links to page_p, treat it as if every page links to it!?!
-            if len(dict_links[page_p]) == 0:
-                pr_page = 1/ N
-            else:
-                for page_i in dict_links[page_p]:
-                    pr_i = dict_pagerank[page_i]
-                    num_links_i = len(corpus[page_i])
-                    s += (pr_i / num_links_i)
+    Uses the sparse-matrix engine of `matrix` when NumPy and SciPy are
+    installed, and `python_pagerank` otherwise.
+    """
+    try:
+        from matrix import sparse_pagerank
+    except ImportError:
+        return python_pagerank(corpus, damping_factor)
+    return sparse_pagerank(corpus, damping_factor)
 
-                pr_page = (1 - damping_factor) / N + damping_factor * s
-            
-            current_pr = dict_pagerank[page_p]
-            delta = abs(current_pr - pr_page)
-            dict_residual[page_p] = delta
-
-            dict_pagerank_new[page_p] = pr_page # store new pagerank for page p
-            print(f"count: {counter} - new page ranks: {dict_pagerank_new}")
-        
-        counter += 1
-        print(f"Counter: {counter} - residuals: {dict_residual}")
-        # check if converged
-        for key in dict_residual:
-            if dict_residual[key] <= 0.001:
-                condition = True
-            else: 
-                condition = False
-                break
-        
-        # update dict_pagerank for next iteration
-        for page in list_pages:
-            dict_pagerank[page] = dict_pagerank_new[page]
-    
-    return dict_pagerank
 
-    # raise NotImplementedError
+def python_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS):
+    """
+    Pure Python power iteration, giving the same result as
+    `matrix.sparse_pagerank`. Pages without links are treated as linking
+    to every page, without changing `corpus`.
+
+    Every iteration adds up the ranks flowing in over the links into
+    each page, so it takes time proportional to the number of pages and
+    links, and stops once the ranks change by less than `tolerance` in
+    total.
+    """
+    pages = list(corpus)
+    number_pages = len(pages)
+    index = {page: i for i, page in enumerate(pages)}
+
+    # pages linking to each page, and the number of links on every page
+    incoming = [[] for _ in pages]
+    number_links = [0] * number_pages
+    for i, page in enumerate(pages):
+        for link in corpus[page]:
+            j = index.get(link)
+            if j is not None and j != i:
+                incoming[j].append(i)
+                number_links[i] += 1
+    dangling = [i for i in range(number_pages) if number_links[i] == 0]
+
+    ranks = [1 / number_pages] * number_pages
+    teleport = (1 - damping_factor) / number_pages
+    for _ in range(max_iterations):
+        share = [rank / links if links else 0 for rank, links in zip(ranks, number_links)]
+        # rank of the pages without links goes to every page
+        dangling_share = sum(ranks[i] for i in dangling) / number_pages
+        new_ranks = [
+            teleport + damping_factor * (dangling_share + sum(share[i] for i in incoming[j]))
+            for j in range(number_pages)
+        ]
+        change = sum(abs(new - old) for new, old in zip(new_ranks, ranks))
+        ranks = new_ranks
+        if change < tolerance:
+            break
+
+    # keep the ranks a probability distribution despite rounding
+    total = sum(ranks)
+    return {page: ranks[i] / total for i, page in enumerate(pages)}
 
 
 if __name__ == "__main__":
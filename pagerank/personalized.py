@@ -0,0 +1,177 @@
+"""
+Personalized PageRank for a batch of teleport distributions.
+
+Instead of jumping to a uniformly random page, a surfer personalized
+to a seed set jumps to one of the seed pages. The ranks for k seed sets
+are the columns of an N x k matrix, and all of them are computed by one
+power iteration of sparse-matrix times dense-matrix products.
+
+Usage: python personalized.py corpus seeds.jsonl output.ranks [--cache FILE]
+
+Every line of the seeds file is a JSON object with a "name" and the
+"pages" to teleport to, optionally with one weight per page in
+"weights". The ranks are written in the binary format of `write_ranks`.
+With --cache, the crawled link graph is kept in FILE and reused by
+later runs on an unchanged corpus.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+import crawler
+from framing import read_framed, write_header
+from matrix import MAX_ITERATIONS, TOLERANCE, LinkMatrix
+from pagerank import DAMPING
+
+MAGIC = b"PRPERS02"
+
+
+def teleport_matrix(pages, seeds):
+    """
+    Returns the N x k teleport matrix for a list of k seed dicts, each
+    mapping page names to (not necessarily normalised) weights.
+    Every column sums to 1.
+    """
+    index = {page: i for i, page in enumerate(pages)}
+    teleport = np.zeros((len(pages), len(seeds)))
+    for column, weights in enumerate(seeds):
+        for page, weight in weights.items():
+            if page not in index:
+                raise ValueError(f"seed page {page} is not in the corpus")
+            teleport[index[page], column] += weight
+        total = teleport[:, column].sum()
+        if total <= 0:
+            raise ValueError(f"seed set {column} has no positive weight")
+        teleport[:, column] /= total
+    return teleport
+
+
+def personalized_pagerank(links, damping_factor, teleport, tolerance=TOLERANCE,
+                          max_iterations=MAX_ITERATIONS):
+    """
+    Iterates PR = (1 - d) * T + d * (M @ PR + dangling mass / N) for the
+    N x k teleport matrix T until the L1 change of every column drops
+    below `tolerance`. Pages without links still link to every page.
+
+    Returns (ranks, iterations), with ranks an N x k matrix whose
+    columns sum to 1.
+    """
+    if teleport.shape[1] == 0:
+        raise ValueError("there are no seed sets to rank")
+    n = len(links)
+    ranks = teleport.copy()
+    jump = (1 - damping_factor) * teleport
+    dangling = np.flatnonzero(links.dangling)
+
+    for iteration in range(1, max_iterations + 1):
+        dangling_mass = ranks[dangling].sum(axis=0)
+        # work in place: with k columns every temporary is N x k
+        new_ranks = links.matrix @ ranks
+        new_ranks += dangling_mass / n
+        new_ranks *= damping_factor
+        new_ranks += jump
+        np.subtract(ranks, new_ranks, out=ranks)
+        change = np.abs(ranks, out=ranks).sum(axis=0).max()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+
+    return ranks / ranks.sum(axis=0), iteration
+
+
+def write_ranks(path, pages, names, ranks):
+    """
+    Writes the N x k `ranks` for the seed sets `names` to `path` in the
+    format of `framing`: a header with the page and seed set names,
+    followed by the ranks as a row-major float32 matrix, one row per
+    page.
+    """
+    header = {"pages": list(pages), "names": list(names), "shape": list(ranks.shape)}
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        write_header(f, MAGIC, header)
+        f.write(np.ascontiguousarray(ranks, dtype=np.float32).tobytes())
+    os.replace(tmp, path)
+
+
+def read_ranks(path):
+    """
+    Memory-maps a file written by `write_ranks`.
+
+    Returns (pages, names, ranks), with ranks a read-only N x k float32
+    array backed by the file.
+    """
+    header, mapping, start = read_framed(path, MAGIC)
+    n, k = header["shape"]
+    ranks = np.frombuffer(mapping, dtype=np.float32, count=n * k, offset=start)
+    return header["pages"], header["names"], ranks.reshape(n, k)
+
+
+def read_seeds(lines):
+    """
+    Parses JSON lines of {"name", "pages", "weights"} into a list of
+    names and a list of page -> weight dicts.
+
+    Raises ValueError if a line is not such an object, or if it has a
+    different number of weights than pages.
+    """
+    names = []
+    seeds = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        seed = json.loads(line)
+        if not isinstance(seed, dict) or not isinstance(seed.get("pages"), list):
+            raise ValueError(f"line {number} has no list of pages")
+        pages = seed["pages"]
+        weights = seed.get("weights")
+        if weights is None:
+            weights = [1] * len(pages)
+        if not isinstance(weights, list) or len(weights) != len(pages):
+            raise ValueError(f"line {number} does not have one weight per page")
+        names.append(seed.get("name", str(len(names))))
+        seeds.append(dict(zip(pages, weights)))
+    return names, seeds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus")
+    parser.add_argument("seeds", help="file with one JSON seed set per line, - for stdin")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=1, help="processes for crawling")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--cache", metavar="FILE",
+                        help="adjacency file to keep the link graph in between runs")
+    args = parser.parse_args()
+
+    try:
+        if args.seeds == "-":
+            names, seeds = read_seeds(sys.stdin)
+        else:
+            with open(args.seeds, encoding="utf-8") as f:
+                names, seeds = read_seeds(f)
+    except ValueError as e:
+        sys.exit(f"Invalid seeds file {args.seeds}: {e}")
+    if not seeds:
+        sys.exit(f"No seed sets in {args.seeds}")
+
+    pages, offsets, targets = crawler.crawl_edges(
+        args.corpus, args.workers, use_cache=args.cache is not None, path=args.cache)
+    try:
+        teleport = teleport_matrix(pages, seeds)
+    except ValueError as e:
+        sys.exit(f"Invalid seeds file {args.seeds}: {e}")
+    links = LinkMatrix.from_adjacency(pages, offsets, targets)
+    ranks, iterations = personalized_pagerank(links, DAMPING, teleport, args.tolerance)
+    write_ranks(args.output, pages, names, ranks)
+    print(f"{len(names)} seed sets, {len(pages)} pages, {iterations} iterations",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()